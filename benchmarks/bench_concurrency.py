@@ -0,0 +1,119 @@
+# benchmarks/bench_concurrency.py - Concurrent reader/writer stress test per PRAGMA profile
+#
+# Simulates many Streamlit sessions sharing one database file: writer threads
+# save chat turns, answers and notifications while reader threads render page
+# stats. Runs once per profile in utils.database.PRAGMA_PROFILES on a fresh
+# database and reports "database is locked" errors and latency percentiles.
+#
+#   python benchmarks/bench_concurrency.py [--seconds 5] [--writers 8] [--readers 16]
+
+import argparse
+import random
+import sqlite3
+import threading
+import time
+
+from common import database, percentile, print_table, seed_user, temp_database
+
+def writer(user_id: int, session_id: int, stop: threading.Event, stats: dict, seed: int):
+    rng = random.Random(seed)
+    while not stop.is_set():
+        start = time.perf_counter()
+        conn = None
+        try:
+            conn = database.get_connection()
+            cursor = conn.cursor()
+            action = rng.random()
+            if action < 0.5:
+                # Chat turn: message insert + session activity update
+                cursor.execute("INSERT INTO chat_messages (session_id, role, content) VALUES (?, 'user', ?)",
+                               (session_id, "x" * rng.randint(50, 2000)))
+                cursor.execute("UPDATE chat_sessions SET last_activity = CURRENT_TIMESTAMP WHERE id = ?",
+                               (session_id,))
+            elif action < 0.8:
+                # Answer write-back
+                cursor.execute("UPDATE questions SET user_answer = ?, is_correct = ? WHERE test_id = ? AND question_number = ?",
+                               (rng.choice("ABCD"), rng.randint(0, 1), rng.randint(1, 50), rng.randint(1, 10)))
+            else:
+                cursor.execute("INSERT INTO notifications (user_id, type, title, content) VALUES (?, 'test', 'Stress', 'x')",
+                               (user_id,))
+            conn.commit()
+            conn.close()
+        except sqlite3.OperationalError as e:
+            stats['errors'] += 'locked' in str(e) or 'busy' in str(e)
+            if conn is not None:
+                conn.close()
+            continue
+        stats['latencies'].append((time.perf_counter() - start) * 1000)
+
+def reader(user_id: int, stop: threading.Event, stats: dict):
+    while not stop.is_set():
+        start = time.perf_counter()
+        try:
+            database.get_user_stats(user_id)
+            database.get_unread_notification_count(user_id)
+            database.get_user_tests(user_id, limit=5)
+        except sqlite3.OperationalError as e:
+            stats['errors'] += 'locked' in str(e) or 'busy' in str(e)
+            continue
+        stats['latencies'].append((time.perf_counter() - start) * 1000)
+
+def run_profile(profile: str, seconds: float, writers: int, readers: int) -> list:
+    database.DB_PROFILE = profile
+    with temp_database():
+        user_id = seed_user(tests=50)
+        conn = database.get_connection()
+        cursor = conn.cursor()
+        cursor.execute("INSERT INTO chat_sessions (user_id, session_name) VALUES (?, 'stress')", (user_id,))
+        session_id = cursor.lastrowid
+        conn.commit()
+        conn.close()
+
+        stop = threading.Event()
+        write_stats = {'errors': 0, 'latencies': []}
+        read_stats = {'errors': 0, 'latencies': []}
+        threads = [threading.Thread(target=writer, args=(user_id, session_id, stop, write_stats, n))
+                   for n in range(writers)]
+        threads += [threading.Thread(target=reader, args=(user_id, stop, read_stats)) for _ in range(readers)]
+        for t in threads:
+            t.start()
+        time.sleep(seconds)
+        stop.set()
+        for t in threads:
+            t.join()
+
+    rows = []
+    for kind, stats in (("write", write_stats), ("read", read_stats)):
+        lat = stats['latencies']
+        rows.append({
+            'profile': profile,
+            'op': kind,
+            'ops/s': len(lat) / seconds,
+            'lock errors': stats['errors'],
+            'p50 ms': percentile(lat, 50),
+            'p99 ms': percentile(lat, 99),
+            'max ms': max(lat) if lat else 0.0,
+        })
+    return rows
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--writers", type=int, default=8)
+    parser.add_argument("--readers", type=int, default=16)
+    parser.add_argument("--profiles", nargs="+", default=list(database.PRAGMA_PROFILES))
+    args = parser.parse_args()
+
+    original_profile = database.DB_PROFILE
+    rows = []
+    try:
+        for profile in args.profiles:
+            rows += run_profile(profile, args.seconds, args.writers, args.readers)
+    finally:
+        database.DB_PROFILE = original_profile
+
+    print_table(f"{args.writers} writers / {args.readers} readers for {args.seconds:g}s", rows,
+                ['profile', 'op', 'ops/s', 'lock errors', 'p50 ms', 'p99 ms', 'max ms'])
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+# benchmarks/bench_connection_pool.py - Per-call connect vs pooled connections
+#
+# Replays the database work of one Home and one Progress page render against
+# a seeded database, first with pooling disabled (a fresh sqlite3.connect per
+# helper call, the old behaviour) and then with the connection pool.
+#
+#   python benchmarks/bench_connection_pool.py [--renders 500]
+
+import argparse
+
+from common import database, print_table, seed_user, temp_database, time_calls
+
+def home_render(user_id: int):
+    """Queries issued by pages/Home.py"""
+    database.get_user_by_id(user_id)
+    database.get_unread_notification_count(user_id)
+    database.get_user_stats(user_id)
+    database.get_user_tests(user_id, limit=5)
+
+def progress_render(user_id: int):
+    """Queries issued by pages/Progress.py"""
+    database.get_unread_notification_count(user_id)
+    database.get_user_stats(user_id)
+
+    conn = database.get_connection()
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT DATE(completed_at) as date, score, topic, difficulty
+        FROM tests
+        WHERE user_id = ? AND completed = 1
+        ORDER BY completed_at
+    """, (user_id,))
+    cursor.fetchall()
+    cursor.execute("""
+        SELECT id, topic, difficulty, total_questions, score, completed, created_at, completed_at
+        FROM tests
+        WHERE user_id = ?
+        ORDER BY created_at DESC
+    """, (user_id,))
+    cursor.fetchall()
+    cursor.execute("""
+        SELECT topic, subtopic, priority, identified_at, test_id
+        FROM gaps
+        WHERE user_id = ? AND resolved = 0
+    """, (user_id,))
+    cursor.fetchall()
+    cursor.execute("SELECT * FROM achievements WHERE user_id = ? ORDER BY earned_at DESC", (user_id,))
+    cursor.fetchall()
+    conn.close()
+
+def run(renders: int):
+    rows = []
+    with temp_database():
+        user_id = seed_user()
+        for label, pool_size in (("per-call connect", 0), ("pooled", database.POOL_SIZE or 8)):
+            database.close_pools()
+            database.POOL_SIZE = pool_size
+            for page, fn in (("Home", home_render), ("Progress", progress_render)):
+                fn(user_id)  # warm up OS cache (and the pool)
+                stats = time_calls(lambda: fn(user_id), renders)
+                rows.append({'page': page, 'mode': label, **stats})
+
+    print_table(f"Page query sets, {renders} renders each (ms per render)", rows,
+                ['page', 'mode', 'mean', 'p50', 'p99', 'total'])
+    for page in ("Home", "Progress"):
+        base, pooled = [r for r in rows if r['page'] == page]
+        print(f"{page}: pooled is {base['mean'] / pooled['mean']:.2f}x faster per render")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--renders", type=int, default=500)
+    args = parser.parse_args()
+    run(args.renders)
@@ -0,0 +1,84 @@
+# benchmarks/bench_grading.py - Per-question vs single-call batch grading
+#
+# Grades the descriptive answers of a simulated test through both paths in
+# utils.test_generator and reports Gemini call count and wall time. The model
+# is simulated: each call costs a fixed round-trip overhead plus a per-item
+# output cost, and a batch response can drop a fraction of its items (which
+# are then re-graded individually).
+#
+#   python benchmarks/bench_grading.py [--answers 8] [--overhead-ms 800] [--per-item-ms 150]
+
+import argparse
+import json
+import random
+import re
+import threading
+import time
+
+from common import print_table
+
+from utils import llm, test_generator
+
+class SimulatedEvaluator:
+    """Stand-in for llm.evaluate with configurable latency and batch item drops"""
+
+    def __init__(self, overhead_ms: float, per_item_ms: float, drop_rate: float, seed: int = 7):
+        self.overhead_ms = overhead_ms
+        self.per_item_ms = per_item_ms
+        self.drop_rate = drop_rate
+        self.rng = random.Random(seed)
+        self.calls = 0
+        self.lock = threading.Lock()
+
+    def __call__(self, prompt: str) -> str:
+        with self.lock:
+            self.calls += 1
+        items = [int(i) for i in re.findall(r"^Item (\d+):", prompt, re.MULTILINE)]
+
+        time.sleep((self.overhead_ms + self.per_item_ms * max(1, len(items))) / 1000)
+
+        if not items:
+            return json.dumps({"score": 75, "is_correct": True, "feedback": "Good answer"})
+
+        with self.lock:
+            kept = [i for i in items if self.rng.random() >= self.drop_rate]
+        return json.dumps([{"item": i, "score": 75, "is_correct": True, "feedback": "Good answer"} for i in kept])
+
+def run(mode: str, answers, evaluator: SimulatedEvaluator, workers: int) -> dict:
+    evaluator.calls = 0
+    start = time.perf_counter()
+    results = test_generator.evaluate_descriptive_answers(answers, "Python", max_workers=workers, mode=mode)
+    elapsed = time.perf_counter() - start
+    assert len(results) == len(answers) and all(results)
+    return {"mode": mode, "workers": workers, "calls": evaluator.calls, "wall_ms": elapsed * 1000}
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--answers", type=int, default=8)
+    parser.add_argument("--overhead-ms", type=float, default=800)
+    parser.add_argument("--per-item-ms", type=float, default=150)
+    parser.add_argument("--drop-rate", type=float, default=0.1)
+    args = parser.parse_args()
+
+    answers = [{
+        "question": f"Explain concept {i} of Python.",
+        "correct_answer": f"Concept {i} is explained by these key points",
+        "user_answer": f"Concept {i} is about some of the key points",
+    } for i in range(args.answers)]
+
+    evaluator = SimulatedEvaluator(args.overhead_ms, args.per_item_ms, args.drop_rate)
+    llm.evaluate = evaluator
+
+    rows = [
+        run("concurrent", answers, evaluator, workers=1),
+        run("concurrent", answers, evaluator, workers=test_generator.GRADING_CONCURRENCY),
+        run("batch", answers, evaluator, workers=test_generator.GRADING_CONCURRENCY),
+    ]
+    rows[0]["mode"] = "sequential"
+    print_table(f"Grading {args.answers} descriptive answers "
+                f"({args.overhead_ms:.0f} ms/call + {args.per_item_ms:.0f} ms/item, "
+                f"{args.drop_rate:.0%} batch drops)",
+                rows, ["mode", "workers", "calls", "wall_ms"])
+
+if __name__ == "__main__":
+    main()
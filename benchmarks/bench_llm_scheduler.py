@@ -0,0 +1,122 @@
+# benchmarks/bench_llm_scheduler.py - A class hitting "Generate Test" at once, with and without the scheduler
+#
+# Simulated students start a test at the same moment while a few others are
+# chatting. The provider is utils.llm_fake.FakeBackend behind a rate quota,
+# enforced over a short sliding window, that answers 429 once exceeded. Each run reports
+# how many calls hit the quota, how many requests failed, and the wait seen
+# by chat versus generation requests, first with utils.llm_scheduler off and
+# then with its shared token bucket sized to the quota: a full burst plus a
+# window's refill must fit in one quota window, so the refill rate is the
+# quota minus the burst spread over the window.
+#
+#   python benchmarks/bench_llm_scheduler.py [--students 40] [--chatters 5] [--quota-per-min 240]
+
+import argparse
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from common import percentile, print_table, temp_database
+
+from utils import llm, llm_scheduler
+from utils.llm_fake import FakeBackend, FakeProviderError
+
+class QuotaBackend(FakeBackend):
+    """FakeBackend that rejects calls beyond its rate quota with 429"""
+
+    def __init__(self, quota_per_min: int, window_s: float, **kwargs):
+        super().__init__(**kwargs)
+        self.window_s = window_s
+        self.quota = max(1, int(quota_per_min * window_s / 60))
+        self.rejected = 0
+        self._window = deque()
+        self._quota_lock = threading.Lock()
+
+    def _admit(self):
+        with self._quota_lock:
+            now = time.monotonic()
+            while self._window and now - self._window[0] > self.window_s:
+                self._window.popleft()
+            if len(self._window) >= self.quota:
+                self.rejected += 1
+                raise FakeProviderError(429, "quota exceeded")
+            self._window.append(now)
+
+    def generate(self, kind, prompt, timeout):
+        self._admit()
+        return super().generate(kind, prompt, timeout)
+
+    def stream(self, kind, prompt, timeout):
+        self._admit()
+        return super().stream(kind, prompt, timeout)
+
+def run(enabled: bool, args) -> dict:
+    llm_scheduler.ENABLED = enabled
+    llm_scheduler.RATE_PER_MIN = args.quota_per_min - args.burst * 60 / args.quota_window_s
+    llm_scheduler.BURST = args.burst
+    llm.breaker = llm.CircuitBreaker()
+    backend = QuotaBackend(args.quota_per_min, args.quota_window_s, latency_ms=args.latency_ms, seed=args.seed)
+    llm.set_backend(backend)
+
+    latencies = {'chat': [], 'generate': []}
+    failures = {'chat': 0, 'generate': 0}
+    lock = threading.Lock()
+
+    def request(user_id: int, kind: str):
+        llm_scheduler.set_request_context(user_id)
+        prompt = (f"Generate questions for the topic: \"Topic {user_id}\"\n- MCQ (Multiple Choice): 5 questions"
+                  if kind == 'generate' else f"student: question {user_id}\n")
+        start = time.perf_counter()
+        try:
+            if kind == 'generate':
+                llm.generate(prompt)
+            else:
+                "".join(llm.chat_stream(prompt))
+            ok = True
+        except Exception:
+            ok = False
+        with lock:
+            latencies[kind].append((time.perf_counter() - start) * 1000)
+            failures[kind] += 0 if ok else 1
+
+    jobs = [(n, 'generate') for n in range(args.students) for _ in range(args.calls_per_student)]
+    jobs += [(args.students + n, 'chat') for n in range(args.chatters) for _ in range(args.calls_per_student)]
+    start = time.perf_counter()
+    with temp_database():
+        with ThreadPoolExecutor(max_workers=len(jobs)) as pool:
+            list(pool.map(lambda job: request(*job), jobs))
+    elapsed = time.perf_counter() - start
+
+    return {
+        "scheduler": "on" if enabled else "off",
+        "quota_429s": backend.rejected,
+        "failed_gen": failures['generate'],
+        "failed_chat": failures['chat'],
+        "chat_p50_ms": percentile(latencies['chat'], 50),
+        "chat_p95_ms": percentile(latencies['chat'], 95),
+        "gen_p50_ms": percentile(latencies['generate'], 50),
+        "gen_p95_ms": percentile(latencies['generate'], 95),
+        "wall_s": elapsed,
+    }
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--students", type=int, default=40)
+    parser.add_argument("--chatters", type=int, default=5)
+    parser.add_argument("--calls-per-student", type=int, default=2, help="e.g. parallel generation chunks")
+    parser.add_argument("--quota-per-min", type=int, default=240)
+    parser.add_argument("--quota-window-s", type=float, default=10, help="window the quota is enforced over")
+    parser.add_argument("--burst", type=float, default=10)
+    parser.add_argument("--latency-ms", type=float, default=200)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rows = [run(False, args), run(True, args)]
+    print_table(f"{args.students} students x {args.calls_per_student} generation calls + {args.chatters} chatting, "
+                f"provider quota {args.quota_per_min}/min",
+                rows, ["scheduler", "quota_429s", "failed_gen", "failed_chat", "chat_p50_ms", "chat_p95_ms",
+                       "gen_p50_ms", "gen_p95_ms", "wall_s"])
+
+if __name__ == "__main__":
+    main()
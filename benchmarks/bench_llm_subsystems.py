@@ -0,0 +1,166 @@
+# benchmarks/bench_llm_subsystems.py - End-to-end load test on the offline LLM backend
+#
+# Runs simulated users concurrently through the whole learning loop (generate
+# a test, grade descriptive answers, analyze gaps, build a study plan, chat)
+# against a temporary database, with utils.llm_fake.FakeBackend in place of
+# Gemini. Reports per-stage latency, the llm_calls telemetry report, LLM call
+# counts and how many stages failed, so changes can be compared on a box with no network.
+#
+# With --replay the calls are served from a cassette recorded by
+# utils.llm_cassette (real Gemini traffic or an earlier --record run), at
+# the recorded timing times --time-scale.
+#
+#   python benchmarks/bench_llm_subsystems.py [--users 8] [--latency-ms 300] [--failure-rate 0.05]
+#   python benchmarks/bench_llm_subsystems.py --replay cassettes/llm.jsonl.gz [--time-scale 0.5]
+
+import argparse
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
+
+from common import percentile, print_table, temp_database
+
+from utils import database, llm, llm_scheduler, llm_telemetry, test_generator
+from utils.chat_analyser import analyze_test_for_gaps
+from utils.llm_cassette import RecordingBackend, ReplayBackend
+from utils.llm_fake import FakeBackend
+from utils.studyPlan_generator import generate_study_plan
+
+STAGES = ["generate", "grade", "gaps", "plan", "chat"]
+
+class StageTimer:
+    """Collects wall time and outcome per stage across threads"""
+
+    def __init__(self):
+        self.samples: Dict[str, List[float]] = {stage: [] for stage in STAGES}
+        self.failures: Dict[str, int] = {stage: 0 for stage in STAGES}
+        self.lock = threading.Lock()
+
+    def run(self, stage: str, fn):
+        start = time.perf_counter()
+        try:
+            result = fn()
+            # Generators return (success, questions), the rest a possibly empty result
+            ok = result[0] if isinstance(result, tuple) else bool(result)
+        except Exception as e:
+            print(f"{stage} error: {e}")
+            result, ok = None, False
+        with self.lock:
+            self.samples[stage].append((time.perf_counter() - start) * 1000)
+            self.failures[stage] += 0 if ok else 1
+        return result
+
+def simulate_user(n: int, args, timer: StageTimer):
+    rng = random.Random(args.seed * 1000 + n)
+    username = f"loaduser{n}"
+    database.create_user(username, f"{username}@example.com", "x", username.title())
+    user_id = database.get_user_by_username(username)['id']
+    llm_scheduler.set_request_context(user_id)
+    topic = f"Topic {n % args.topics}"
+
+    for _ in range(args.rounds):
+        generated = timer.run("generate", lambda: test_generator.generate_test_questions(
+            topic, "medium", args.questions, include_descriptive=True, user_id=user_id))
+        if not generated or not generated[0]:
+            continue
+        questions = generated[1]
+        test_id = database.create_test_with_questions(user_id, topic, "medium", questions, True)
+
+        answers, descriptive = [], []
+        for num, q in enumerate(questions, 1):
+            if q['type'] == 'MCQ':
+                answer = rng.choice(q['options'])
+                answers.append({'question_number': num, 'user_answer': answer,
+                                'is_correct': answer == q['correct_answer']})
+            else:
+                descriptive.append((num, {'question': q['question'], 'correct_answer': q['correct_answer'],
+                                          'user_answer': "Partly remembered " + q['correct_answer'][:30]}))
+        results = timer.run("grade", lambda: test_generator.evaluate_descriptive_answers(
+            [a for _, a in descriptive], topic))
+        for (num, a), result in zip(descriptive, results or []):
+            answers.append({'question_number': num, 'user_answer': a['user_answer'], 'is_correct': result[0]})
+        score = 100 * sum(a['is_correct'] for a in answers) / max(1, len(answers))
+        database.submit_test_results(test_id, answers, score)
+
+        timer.run("gaps", lambda: analyze_test_for_gaps(test_id, user_id))
+
+    timer.run("plan", lambda: generate_study_plan(user_id, target_days=7)[0])
+
+    def chat():
+        reply = "".join(llm.chat_stream(f"student: Can you explain {topic} again?\n"))
+        return len(reply) > 0
+    for _ in range(args.chats):
+        timer.run("chat", chat)
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=8)
+    parser.add_argument("--rounds", type=int, default=2, help="tests taken per user")
+    parser.add_argument("--chats", type=int, default=3, help="chat turns per user")
+    parser.add_argument("--questions", type=int, default=10)
+    parser.add_argument("--topics", type=int, default=3, help="distinct topics shared by the users")
+    parser.add_argument("--latency-ms", type=float, default=300)
+    parser.add_argument("--distribution", choices=["lognormal", "uniform", "fixed"], default="lognormal")
+    parser.add_argument("--failure-rate", type=float, default=0.05)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--record", metavar="CASSETTE", help="also record the fake backend's traffic")
+    parser.add_argument("--replay", metavar="CASSETTE", help="serve calls from a cassette instead")
+    parser.add_argument("--time-scale", type=float, default=1.0, help="replay latency multiplier")
+    parser.add_argument("--rate-per-min", type=float, default=0, help="shared LLM rate limit (0 = scheduler off)")
+    args = parser.parse_args()
+
+    llm_scheduler.ENABLED = args.rate_per_min > 0
+    llm_scheduler.RATE_PER_MIN = args.rate_per_min
+
+    calls: Dict[str, int] = {}
+    if args.replay:
+        backend = ReplayBackend(args.replay, time_scale=args.time_scale)
+        source = f"cassette {args.replay} at {args.time_scale:g}x timing"
+    else:
+        backend = FakeBackend(seed=args.seed, latency_ms=args.latency_ms,
+                              latency_distribution=args.distribution, failure_rate=args.failure_rate)
+        calls = backend.calls
+        source = (f"the fake backend ({args.distribution} {args.latency_ms:.0f} ms, "
+                  f"{args.failure_rate:.0%} failures)")
+        if args.record:
+            backend = RecordingBackend(backend, args.record)
+    llm.set_backend(backend)
+    timer = StageTimer()
+
+    with temp_database():
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.users) as pool:
+            for future in [pool.submit(simulate_user, n, args, timer) for n in range(args.users)]:
+                future.result()
+        elapsed = time.perf_counter() - start
+        telemetry = llm_telemetry.get_report()
+
+    rows = [{
+        "stage": stage,
+        "runs": len(timer.samples[stage]),
+        "failed": timer.failures[stage],
+        "p50_ms": percentile(timer.samples[stage], 50),
+        "p95_ms": percentile(timer.samples[stage], 95),
+        "max_ms": max(timer.samples[stage], default=0.0),
+    } for stage in STAGES]
+    print_table(f"{args.users} users on {source}, {elapsed:.1f}s wall",
+                rows, ["stage", "runs", "failed", "p50_ms", "p95_ms", "max_ms"])
+
+    print_table("Telemetry per call site (llm_calls)",
+                [dict(site=site, **values) for site, values in telemetry.items()],
+                ["site", "calls", "errors", "retries", "fallbacks", "wall_p50_ms", "wall_p95_ms", "wall_p99_ms",
+                 "ttfb_p50_ms", "avg_prompt_tokens", "avg_response_tokens", "cache_hit_ratio"])
+
+    stats = llm.get_resilience_stats()
+    if calls:
+        print_table("LLM calls", [dict(kind=kind, calls=count) for kind, count in sorted(calls.items())],
+                    ["kind", "calls"])
+    if args.replay:
+        print(f"\nreplayed {backend.stats['exact']} exact and {backend.stats['substituted']} substituted responses")
+    print(f"\nretries={stats['retries']} failures={stats['failures']} short_circuited={stats['short_circuited']} "
+          f"breaker={stats['breaker_state']} (opened {stats['breaker_opened']}x)")
+
+if __name__ == "__main__":
+    main()
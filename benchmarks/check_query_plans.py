@@ -0,0 +1,17 @@
+# benchmarks/check_query_plans.py - Assert that no hot query scans a whole table
+#
+# Thin CLI around tests/test_query_plans.py, which builds a fresh database
+# through init_db() (so every migration runs) and asserts that
+# EXPLAIN QUERY PLAN over utils.migrations.HOT_QUERIES has no SCAN step.
+#
+#   python benchmarks/check_query_plans.py
+
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+if __name__ == "__main__":
+    sys.exit(pytest.main(["-q", os.path.join(ROOT, "tests", "test_query_plans.py")]))
@@ -0,0 +1,116 @@
+# benchmarks/common.py - Shared helpers for the benchmark scripts
+
+import os
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, List
+
+# Allow running scripts directly: python benchmarks/bench_xxx.py
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from utils import database, near_duplicates, seen_filter  # noqa: E402
+
+TOPICS = ["Python", "Physics", "History", "Algebra", "Biology", "Chemistry"]
+DIFFICULTIES = ["easy", "medium", "hard"]
+
+@contextmanager
+def temp_database():
+    """Point utils.database at a fresh, initialized database file"""
+    workdir = tempfile.mkdtemp(prefix="gapmentor_bench_")
+    old_path = database.DATABASE_PATH
+    database.close_pools()
+    database.DATABASE_PATH = os.path.join(workdir, "bench.db")
+    try:
+        database.init_db()
+        yield database.DATABASE_PATH
+    finally:
+        database.flush_writes()
+        database.close_pools()
+        database.DATABASE_PATH = old_path
+        shutil.rmtree(workdir, ignore_errors=True)
+
+def seed_user(username: str = "bench", tests: int = 200, questions_per_test: int = 10,
+              gaps: int = 30, notifications: int = 50, seed: int = 7) -> int:
+    """Create a user with a realistic amount of history and return its id"""
+    rng = random.Random(seed)
+    database.create_user(username, f"{username}@example.com", "x", username.title())
+    user_id = database.get_user_by_username(username)['id']
+
+    conn = database.get_connection()
+    cursor = conn.cursor()
+    for i in range(tests):
+        topic = rng.choice(TOPICS)
+        cursor.execute("""
+            INSERT INTO tests (user_id, topic, topic_normalized, difficulty, total_questions,
+                               score, completed, created_at, completed_at)
+            VALUES (?, ?, ?, ?, ?, ?, 1, datetime('now', ?), datetime('now', ?))
+        """, (user_id, topic, topic.lower(), rng.choice(DIFFICULTIES), questions_per_test,
+              rng.randint(0, 100), f"-{tests - i} hours", f"-{tests - i} hours"))
+        test_id = cursor.lastrowid
+        cursor.executemany("""
+            INSERT INTO questions (test_id, question_number, question_text, question_type,
+                                   options, correct_answer, user_answer, is_correct, question_hash, minhash)
+            VALUES (?, ?, ?, 'MCQ', '["A", "B", "C", "D"]', 'A', ?, ?, ?, ?)
+        """, [(test_id, n, text, rng.choice("ABCD"), rng.randint(0, 1), database.question_hash(text),
+               near_duplicates.to_blob(near_duplicates.signature(text, topic)))
+              for n, text in ((n, f"{topic} question {i}-{n}?") for n in range(1, questions_per_test + 1))])
+    for i in range(gaps):
+        topic = rng.choice(TOPICS)
+        cursor.execute("""
+            INSERT INTO gaps (user_id, topic, topic_normalized, subtopic, priority, resolved)
+            VALUES (?, ?, ?, ?, ?, ?)
+        """, (user_id, topic, topic.lower(), f"Subtopic {i}", rng.choice(["high", "medium", "low"]),
+              int(rng.random() < 0.3)))
+    for i in range(notifications):
+        cursor.execute("""
+            INSERT INTO notifications (user_id, type, title, content, read)
+            VALUES (?, 'test', ?, ?, ?)
+        """, (user_id, f"Notification {i}", "Benchmark notification", int(rng.random() < 0.5)))
+    # Questions were inserted directly, so build the seen-question filters from them
+    seen_filter.rebuild_all(conn, user_id)
+    conn.commit()
+    conn.close()
+    return user_id
+
+def percentile(samples: List[float], pct: float) -> float:
+    """Nearest-rank percentile of a list of samples"""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    rank = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[rank]
+
+def time_calls(fn: Callable[[], object], iterations: int) -> Dict[str, float]:
+    """Run fn repeatedly and return latency stats in milliseconds"""
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return {
+        'mean': statistics.mean(samples),
+        'p50': percentile(samples, 50),
+        'p99': percentile(samples, 99),
+        'total': sum(samples),
+    }
+
+def print_table(title: str, rows: List[Dict], columns: List[str]):
+    """Print benchmark results as a simple aligned table"""
+    print(f"\n{title}")
+    widths = {c: max(len(c), *(len(_fmt(r.get(c))) for r in rows)) for c in columns}
+    print("  ".join(c.ljust(widths[c]) for c in columns))
+    print("  ".join("-" * widths[c] for c in columns))
+    for row in rows:
+        print("  ".join(_fmt(row.get(c)).ljust(widths[c]) for c in columns))
+
+def _fmt(value) -> str:
+    if isinstance(value, float):
+        return f"{value:.3f}"
+    return str(value)
@@ -2,7 +2,7 @@
 
 import streamlit as st
 from utils.auth import require_authentication, get_current_user, require_login
-from utils.database import get_connection, get_user_stats, get_user_tests, get_unread_notification_count
+from utils.database import get_connection, get_user_stats, get_user_tests, get_test_history, get_unread_notification_count
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
@@ -23,6 +23,9 @@ require_authentication()
 
 user = get_current_user()
 
+# Tests shown per page in the Test History tab
+TESTS_PER_PAGE = 20
+
 # Custom CSS
 st.markdown("""
     <style>
@@ -351,45 +354,34 @@ with tab2:
     with col3:
         sort_by = st.selectbox("Sort by", ["Date (Newest)", "Date (Oldest)", "Score (High)", "Score (Low)"])
     
-    # Get all tests with filters
-    query = """
-        SELECT 
-            id,
-            topic,
-            difficulty,
-            total_questions,
-            score,
-            completed,
-            created_at,
-            completed_at
-        FROM tests
-        WHERE user_id = ?
-    """
-    params = [user['id']]
-    
-    if topic_filter != "All":
-        query += " AND topic = ?"
-        params.append(topic_filter)
-    
-    if difficulty_filter != "All":
-        query += " AND difficulty = ?"
-        params.append(difficulty_filter.lower())
-    
-    # Sort
-    if sort_by == "Date (Newest)":
-        query += " ORDER BY created_at DESC"
-    elif sort_by == "Date (Oldest)":
-        query += " ORDER BY created_at ASC"
-    elif sort_by == "Score (High)":
-        query += " ORDER BY score DESC"
-    else:
-        query += " ORDER BY score ASC"
-    
-    cursor.execute(query, params)
-    all_tests = [dict(row) for row in cursor.fetchall()]
+    # Map the UI choices onto get_test_history() arguments
+    sort_options = {
+        "Date (Newest)": 'newest',
+        "Date (Oldest)": 'oldest',
+        "Score (High)": 'score_high',
+        "Score (Low)": 'score_low'
+    }
+    history_filters = {
+        'topic': topic_filter if topic_filter != "All" else None,
+        'difficulty': difficulty_filter.lower() if difficulty_filter != "All" else None,
+        'sort': sort_options[sort_by]
+    }
     
-    if all_tests:
-        for test in all_tests:
+    # Cursors of the pages visited so far; reset when the filters change
+    if st.session_state.get('history_filters') != history_filters:
+        st.session_state.history_filters = history_filters
+        st.session_state.history_cursors = [None]
+    
+    page_cursors = st.session_state.history_cursors
+    page_tests, next_cursor = get_test_history(
+        user['id'],
+        cursor=page_cursors[-1],
+        page_size=TESTS_PER_PAGE,
+        **history_filters
+    )
+    
+    if page_tests:
+        for test in page_tests:
             status = "✅ Completed" if test['completed'] else "⏳ In Progress"
             score_badge = ""
             
@@ -409,8 +401,39 @@ with tab2:
                 </div>
             """, unsafe_allow_html=True)
         
-        # Export option
+        # Pagination
+        col_prev, col_page, col_next = st.columns([1, 1, 1])
+        
+        with col_prev:
+            if len(page_cursors) > 1:
+                if st.button("⬅️ Previous", use_container_width=True, key="history_prev"):
+                    page_cursors.pop()
+                    st.rerun()
+        
+        with col_page:
+            st.caption(f"Page {len(page_cursors)}")
+        
+        with col_next:
+            if next_cursor is not None:
+                if st.button("Next ➡️", use_container_width=True, key="history_next"):
+                    page_cursors.append(next_cursor)
+                    st.rerun()
+        
+        # Export option (fetches the full filtered history only when requested)
         if st.button("💾 Export Test History as CSV"):
+            all_tests = []
+            export_cursor = None
+            while True:
+                tests_page, export_cursor = get_test_history(
+                    user['id'],
+                    cursor=export_cursor,
+                    page_size=500,
+                    **history_filters
+                )
+                all_tests.extend(tests_page)
+                if export_cursor is None:
+                    break
+            
             df_export = pd.DataFrame(all_tests)
             csv = df_export.to_csv(index=False)
             st.download_button(
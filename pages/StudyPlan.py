@@ -5,6 +5,7 @@ from utils.studyPlan_generator import generate_study_plan, get_active_study_plan
 from utils.auth import require_authentication, get_current_user, require_login
 from utils.studyPlan_generator import generate_study_plan, get_active_study_plan, complete_task, get_study_plan_history, update_task_status
 from utils.database import get_connection, get_user_stats, get_user_tests, get_unread_notification_count
+from utils import llm_scheduler
 from datetime import datetime, timedelta
 
 
@@ -392,6 +393,7 @@ with tab1:
             )
             
             if st.button("🚀 Generate Study Plan", use_container_width=True, type="primary"):
+                llm_scheduler.set_request_context(user['id'], llm_scheduler.wait_notice(st.empty()))
                 with st.spinner("🧠 AI is creating your personalized study plan..."):
                     success, plan_id = generate_study_plan(user['id'], target_days)
                     
@@ -2,10 +2,11 @@
 
 import streamlit as st
 from utils.auth import require_authentication, get_current_user, require_login
-from utils.database import create_test, save_question, save_user_answer, complete_test, get_user_stats, get_user_tests, get_unread_notification_count
-from utils.test_generator import generate_test_questions, evaluate_descriptive_answer, filter_duplicate_questions
+from utils.database import create_test_with_questions, submit_test_results, get_user_stats, get_user_tests, get_unread_notification_count
+from utils.test_generator import generate_test_questions, evaluate_descriptive_answers, filter_duplicate_questions
 from utils.chat_analyser import analyze_test_for_gaps
-import json
+from utils.question_bank import draw_questions, add_questions as add_bank_questions
+from utils import llm_scheduler
 from datetime import datetime
  
 
@@ -334,45 +335,52 @@ if st.session_state.test_stage == 'config':
         if not topic or len(topic.strip()) < 2:
             st.error("❌ Please enter a valid topic!")
         else:
+            # Queue AI calls fairly under this user; show the wait if the service is busy
+            llm_scheduler.set_request_context(user['id'], llm_scheduler.wait_notice(st.empty()))
             with st.spinner("🧠 AI is generating your test... This may take a moment."):
-                # Generate questions
-                success, questions = generate_test_questions(
+                # Start instantly from the question bank; call Gemini only on a miss
+                questions = draw_questions(
+                    user_id=user['id'],
                     topic=topic.strip(),
                     difficulty=difficulty.lower(),
                     num_questions=num_questions,
                     include_descriptive=include_descriptive
                 )
+                success = questions is not None
+                
+                if not success:
+                    # Generate questions
+                    success, questions = generate_test_questions(
+                        topic=topic.strip(),
+                        difficulty=difficulty.lower(),
+                        num_questions=num_questions,
+                        include_descriptive=include_descriptive,
+                        user_id=user['id']
+                    )
+                    
+                    # Share them through the bank (refilled in the background)
+                    if success:
+                        add_bank_questions(topic.strip(), difficulty.lower(), questions)
                 
                 if success:
                     # Filter out duplicate questions
                     questions = filter_duplicate_questions(user['id'], topic, questions)
                     
                     if len(questions) < num_questions:
-                        st.warning(f"⚠️ Generated {len(questions)} unique questions (removed duplicates)")
+                        st.warning(f"⚠️ Generated {len(questions)} of {num_questions} unique questions")
                     
                     if len(questions) == 0:
                         st.error("❌ Unable to generate unique questions. You may have already been tested on all aspects of this topic. Try a different topic or difficulty level.")
                     else:
-                        # Create test in database
-                        test_id = create_test(
+                        # Create test and save its questions in one transaction
+                        test_id = create_test_with_questions(
                             user_id=user['id'],
                             topic=topic.strip(),
                             difficulty=difficulty.lower(),
-                            total_questions=len(questions),
+                            questions=questions,
                             include_descriptive=include_descriptive
                         )
                         
-                        # Save questions to database
-                        for idx, q in enumerate(questions, 1):
-                            save_question(
-                                test_id=test_id,
-                                question_number=idx,
-                                question_text=q['question'],
-                                question_type=q['type'],
-                                options=json.dumps(q['options']) if q['options'] else None,
-                                correct_answer=q['correct_answer']
-                            )
-                        
                         # Update session state
                         st.session_state.current_test_id = test_id
                         st.session_state.test_questions = questions
@@ -485,9 +493,25 @@ elif st.session_state.test_stage == 'testing':
                         st.stop()
                 
                 # Evaluate test
+                llm_scheduler.set_request_context(user['id'], llm_scheduler.wait_notice(st.empty()))
                 with st.spinner("📊 Evaluating your test..."):
                     correct_count = 0
                     total_score = 0
+                    answers = []
+                    
+                    # Grade all answered descriptive questions concurrently
+                    descriptive_idx = [
+                        idx for idx, q in enumerate(questions)
+                        if q['type'] != 'MCQ' and st.session_state.user_answers.get(idx, "")
+                    ]
+                    evaluations = dict(zip(descriptive_idx, evaluate_descriptive_answers(
+                        [{
+                            'question': questions[idx]['question'],
+                            'correct_answer': questions[idx]['correct_answer'],
+                            'user_answer': st.session_state.user_answers[idx]
+                        } for idx in descriptive_idx],
+                        topic=config['topic']
+                    )))
                     
                     for idx, q in enumerate(questions):
                         user_answer = st.session_state.user_answers.get(idx, "")
@@ -496,13 +520,8 @@ elif st.session_state.test_stage == 'testing':
                             is_correct = user_answer == q['correct_answer']
                             score = 100 if is_correct else 0
                         else:  # Descriptive
-                            if user_answer:
-                                is_correct, score, feedback = evaluate_descriptive_answer(
-                                    question=q['question'],
-                                    correct_answer=q['correct_answer'],
-                                    user_answer=user_answer,
-                                    topic=config['topic']
-                                )
+                            if idx in evaluations:
+                                is_correct, score, feedback = evaluations[idx]
                             else:
                                 is_correct = False
                                 score = 0
@@ -512,19 +531,17 @@ elif st.session_state.test_stage == 'testing':
                         
                         total_score += score
                         
-                        # Save answer to database
-                        save_user_answer(
-                            test_id=st.session_state.current_test_id,
-                            question_number=idx + 1,
-                            user_answer=user_answer,
-                            is_correct=is_correct
-                        )
+                        answers.append({
+                            'question_number': idx + 1,
+                            'user_answer': user_answer,
+                            'is_correct': is_correct
+                        })
                     
                     # Calculate final score
                     final_score = round(total_score / len(questions), 1)
                     
-                    # Complete test
-                    complete_test(st.session_state.current_test_id, final_score)
+                    # Save all answers and complete the test in one transaction
+                    save_ms = submit_test_results(st.session_state.current_test_id, answers, final_score)
                     
                     # Analyze for gaps
                     gaps = analyze_test_for_gaps(st.session_state.current_test_id, user['id'])
@@ -534,17 +551,19 @@ elif st.session_state.test_stage == 'testing':
                         'score': final_score,
                         'correct': correct_count,
                         'total': len(questions),
-                        'gaps': gaps
+                        'gaps': gaps,
+                        'save_ms': save_ms
                     }
                     
-                    # Create notification
+                    # Create notification (committed now so the sidebar badge shows it)
                     from utils.database import create_notification
                     create_notification(
                         user['id'],
                         'test',
                         'Test Completed!',
                         f'You scored {final_score}% on {config["topic"]}',
-                        '/Progress'
+                        '/Progress',
+                        wait=True
                     )
                     
                     st.session_state.test_stage = 'results'
@@ -565,6 +584,7 @@ elif st.session_state.test_stage == 'results':
             <p>{results['correct']} out of {results['total']} questions correct</p>
         </div>
     """, unsafe_allow_html=True)
+    st.caption(f"💾 Answers saved in {results.get('save_ms', 0):.0f} ms")
     
     # Performance feedback
     if results['score'] >= 80:
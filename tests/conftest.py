@@ -0,0 +1,23 @@
+# tests/conftest.py - Shared setup for the test suite
+
+import os
+import sys
+
+import pytest
+
+# Allow running from any directory: pytest tests/
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+@pytest.fixture
+def temp_db(tmp_path, monkeypatch):
+    """Point utils.database at a fresh database built by init_db()"""
+    from utils import database
+
+    database.close_pools()
+    monkeypatch.setattr(database, "DATABASE_PATH", str(tmp_path / "test.db"))
+    database.init_db()
+    yield database.DATABASE_PATH
+    database.flush_writes()
+    database.close_pools()
@@ -0,0 +1,20 @@
+# tests/test_llm_backends.py - Backend interface and the offline fake
+
+import pytest
+
+from utils import llm
+from utils.llm_fake import FakeBackend
+
+def test_backend_without_generate_fails_at_construction():
+    class Incomplete(llm.Backend):
+        name = "incomplete"
+
+    with pytest.raises(TypeError):
+        Incomplete()
+
+def test_fake_backend_is_deterministic_per_seed():
+    prompt = 'Generate questions for the topic: "Python"\n- MCQ (Multiple Choice): 3 questions'
+    first = FakeBackend(seed=3, sleep=False).generate('generate', prompt, timeout=5)
+    again = FakeBackend(seed=3, sleep=False).generate('generate', prompt, timeout=5)
+    assert first == again
+    assert "".join(FakeBackend(seed=3, sleep=False).stream('generate', prompt, timeout=5)).strip() == first
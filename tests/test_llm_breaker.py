@@ -0,0 +1,71 @@
+# tests/test_llm_breaker.py - Circuit breaker around LLM calls
+
+import time
+
+import pytest
+
+from utils import llm, llm_scheduler
+
+@pytest.fixture
+def breaker(monkeypatch):
+    """A fresh breaker that opens on one failure and cools down quickly"""
+    monkeypatch.setattr(llm_scheduler, "ENABLED", False)
+    monkeypatch.setattr(llm, "MAX_ATTEMPTS", 1)
+    breaker = llm.CircuitBreaker(threshold=1, cooldown=0.05)
+    monkeypatch.setattr(llm, "breaker", breaker)
+    return breaker
+
+def fail_with(error):
+    def request(timeout):
+        raise error
+    return request
+
+def test_non_transient_error_settles_half_open_trial(breaker):
+    with pytest.raises(TimeoutError):
+        llm._with_retries('evaluate', fail_with(TimeoutError("slow")))
+    assert breaker.state == 'open'
+    with pytest.raises(llm.LLMUnavailableError):
+        llm._with_retries('evaluate', lambda timeout: "ok")
+
+    time.sleep(0.06)
+    # The trial gets an answer, just not a usable one (e.g. a safety-blocked response)
+    with pytest.raises(ValueError):
+        llm._with_retries('evaluate', fail_with(ValueError("blocked")))
+    assert breaker.state == 'closed'
+    assert llm._with_retries('evaluate', lambda timeout: "ok") == "ok"
+
+def test_transient_error_reopens_half_open_breaker(breaker):
+    with pytest.raises(TimeoutError):
+        llm._with_retries('evaluate', fail_with(TimeoutError("slow")))
+    time.sleep(0.06)
+    with pytest.raises(TimeoutError):
+        llm._with_retries('evaluate', fail_with(TimeoutError("still slow")))
+    assert breaker.state == 'open'
+
+    time.sleep(0.06)
+    assert llm._with_retries('evaluate', lambda timeout: "ok") == "ok"
+    assert breaker.state == 'closed'
+
+def test_interrupted_trial_frees_the_slot(breaker):
+    with pytest.raises(TimeoutError):
+        llm._with_retries('evaluate', fail_with(TimeoutError("slow")))
+    time.sleep(0.06)
+    with pytest.raises(KeyboardInterrupt):
+        llm._with_retries('evaluate', fail_with(KeyboardInterrupt()))
+    assert breaker.state == 'half_open'
+    assert llm._with_retries('evaluate', lambda timeout: "ok") == "ok"
+
+def test_queue_timeout_frees_the_trial_slot(breaker, monkeypatch):
+    with pytest.raises(TimeoutError):
+        llm._with_retries('evaluate', fail_with(TimeoutError("slow")))
+    time.sleep(0.06)
+
+    def busy(kind):
+        raise llm_scheduler.QueueTimeoutError("queue full")
+    monkeypatch.setattr(llm_scheduler, "acquire", busy)
+    with pytest.raises(llm.LLMUnavailableError):
+        llm._with_retries('evaluate', lambda timeout: "ok")
+
+    monkeypatch.setattr(llm_scheduler, "acquire", lambda kind: 0.0)
+    assert llm._with_retries('evaluate', lambda timeout: "ok") == "ok"
+    assert breaker.state == 'closed'
@@ -0,0 +1,27 @@
+# tests/test_llm_parsing.py - Salvaging almost-JSON LLM responses
+
+from utils.llm_parsing import EVALUATION_SCHEMA, QUESTION_SCHEMA, parse_array, parse_object
+
+def test_non_finite_score_is_invalid():
+    for raw in ("Infinity", "-Infinity", "NaN"):
+        evaluation, dropped = parse_object(f'{{"score": {raw}, "feedback": "ok"}}', EVALUATION_SCHEMA)
+        assert evaluation is None
+        assert dropped == ["'score' is not a finite number"]
+
+def test_trailing_comma_inside_options_keeps_the_question():
+    text = '''```json
+    [
+      {"question": "What does {}.get() return?", "type": "MCQ", "options": ["a", "b",], "correct_answer": "a",},
+      {"question": "Why \\"x,]\\"?", "type": "Descriptive", "correct_answer": "b"}
+    ]
+    ```'''
+    questions, dropped = parse_array(text, QUESTION_SCHEMA)
+    assert dropped == []
+    assert questions[0]['options'] == ["a", "b"]
+    assert questions[1]['question'] == 'Why "x,]"?'
+
+def test_truncated_last_item_is_reported():
+    questions, dropped = parse_array('[{"question": "a", "type": "Descriptive", "correct_answer": "x"}, {"quest',
+                                     QUESTION_SCHEMA)
+    assert len(questions) == 1
+    assert dropped == ["item 1: truncated"]
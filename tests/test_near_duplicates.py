@@ -0,0 +1,65 @@
+# tests/test_near_duplicates.py - Near-duplicate detection against labelled question pairs
+
+import pytest
+
+from utils import near_duplicates
+from utils.near_duplicates import SIMILARITY_THRESHOLD, signature, similarity
+
+# (topic, question, question) pairs that ask the same thing
+DUPLICATES = [
+    ("Python", "What does a Python list comprehension do?", "What do list comprehensions do in Python?"),
+    ("Python", "What is the time complexity of appending to a Python list?",
+     "What is the time complexity of list append in Python?"),
+    ("Python", "Explain the difference between a list and a tuple.",
+     "What is the difference between lists and tuples in Python?"),
+    ("Python", "What is a decorator in Python?", "What are decorators in Python?"),
+    ("Python", "How do you reverse a string in Python?", "How can you reverse a string in Python?"),
+    ("Python", "What keyword is used to define a function in Python?",
+     "Which keyword is used to define functions in Python?"),
+    ("Physics", "What is Newton's second law of motion?", "State Newton's second law of motion."),
+]
+
+# Pairs on the same subject that ask different things
+DISTINCT = [
+    ("Python", "What is the time complexity of inserting an element at the beginning of a Python list?",
+     "What is the time complexity of removing an element from the end of a Python list?"),
+    ("Python", "What is the time complexity of list.insert(0, x)?", "What is the time complexity of list.remove(x)?"),
+    ("Python", "What is the difference between a list and a tuple in Python?",
+     "What is the difference between a list and a set in Python?"),
+    ("Python", "What is the output of 2**3 in Python?", "What is the output of 3**2 in Python?"),
+    ("Python", "What does the @classmethod decorator do in Python?", "What is a decorator in Python?"),
+    ("Python", "What does the @property decorator do in Python?", "What is a decorator in Python?"),
+    ("Python", "What does the @property decorator do in Python?",
+     "What does the @classmethod decorator do in Python?"),
+    ("Calculus", "What is the derivative of x^2?", "What is the derivative of x^3?"),
+    ("History", "Who was the first president of the United States?",
+     "Who was the second president of the United States?"),
+    ("Chemistry", "What is the chemical symbol for gold?", "What is the chemical symbol for silver?"),
+]
+
+def score(topic, a, b):
+    return similarity(signature(a, topic), signature(b, topic))
+
+@pytest.mark.parametrize("topic,a,b", DUPLICATES)
+def test_rephrasings_are_duplicates(topic, a, b):
+    assert score(topic, a, b) >= SIMILARITY_THRESHOLD
+
+@pytest.mark.parametrize("topic,a,b", DISTINCT)
+def test_distinct_questions_are_kept(topic, a, b):
+    assert score(topic, a, b) < SIMILARITY_THRESHOLD
+
+def test_stem_matches_plurals_and_verb_forms():
+    assert near_duplicates.stem("comprehensions") == near_duplicates.stem("comprehension")
+    assert near_duplicates.stem("dictionaries") == near_duplicates.stem("dictionary")
+    assert near_duplicates.stem("inserting") == near_duplicates.stem("inserted") == near_duplicates.stem("insert")
+    assert near_duplicates.stem("classes") == near_duplicates.stem("class")
+
+def test_topic_only_question_keeps_its_words():
+    assert near_duplicates.shingles("What is Python?", "Python") == {"python"}
+
+def test_index_finds_labelled_duplicates():
+    index = near_duplicates.NearDuplicateIndex()
+    for n, (topic, a, _) in enumerate(DUPLICATES + DISTINCT):
+        index.add(n, signature(a, topic))
+    for topic, _, b in DUPLICATES:
+        assert index.match(signature(b, topic)) is not None
@@ -0,0 +1,15 @@
+# tests/test_query_plans.py - No hot query may scan a whole table
+
+from utils import database
+from utils.migrations import HOT_QUERIES, LATEST_VERSION, find_full_scans, get_schema_version
+
+def test_hot_queries_use_an_index(temp_db):
+    conn = database.get_connection()
+    conn.execute("ANALYZE")
+    version = get_schema_version(conn)
+    scans = find_full_scans(conn)
+    conn.close()
+
+    assert version == LATEST_VERSION
+    assert HOT_QUERIES
+    assert scans == []
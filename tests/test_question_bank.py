@@ -0,0 +1,34 @@
+# tests/test_question_bank.py - Question bank keys
+
+import json
+
+from utils import database, migrations, question_bank
+
+def mcq(text):
+    return {'type': 'MCQ', 'question': text, 'options': ["a", "b"], 'correct_answer': "a"}
+
+def bank_keys():
+    conn = database.get_connection()
+    keys = [row[0] for row in conn.execute("SELECT question_key FROM question_bank ORDER BY id")]
+    conn.close()
+    return keys
+
+def test_bank_dedupes_on_question_hash(temp_db):
+    question_bank.add_questions("Python", "easy", [mcq("What is a  tuple?"), mcq("what is a tuple? ")])
+    database.flush_writes()
+    assert bank_keys() == [database.question_hash("What is a tuple?")]
+
+def test_migration_rekeys_old_bank_rows(temp_db):
+    conn = database.get_connection()
+    conn.executemany("""
+        INSERT INTO question_bank (topic_normalized, difficulty, question_type, question_key,
+                                   question_json, created_at, served)
+        VALUES ('python', 'easy', 'MCQ', ?, ?, 0, ?)
+    """, [("what is a tuple?", json.dumps(mcq("What is a tuple?")), 0),
+          ("what is a  tuple?", json.dumps(mcq("What is a  tuple?")), 3)])
+    migrations._migration_15_bank_question_hash(conn.cursor())
+    rows = conn.execute("SELECT question_key, served FROM question_bank").fetchall()
+    conn.commit()
+    conn.close()
+
+    assert [tuple(row) for row in rows] == [(database.question_hash("What is a tuple?"), 3)]
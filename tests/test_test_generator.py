@@ -0,0 +1,91 @@
+# tests/test_test_generator.py - Question selection and grading helpers
+
+import json
+import threading
+
+from utils import llm, llm_scheduler, llm_telemetry, test_generator
+from utils.llm_fake import FakeBackend
+
+def mcq(n):
+    return [{'type': 'MCQ', 'question': f"mcq {i}", 'options': ["a", "b"], 'correct_answer': "a"} for i in range(n)]
+
+def descriptive(n):
+    return [{'type': 'Descriptive', 'question': f"desc {i}", 'correct_answer': "a"} for i in range(n)]
+
+def test_cached_set_is_selected_to_the_generation_split():
+    selected = test_generator._select_by_type(descriptive(5) + mcq(10), 10, include_descriptive=True)
+    assert [q['type'] for q in selected] == ["MCQ"] * 6 + ["Descriptive"] * 4
+
+def test_cached_set_short_of_one_type_is_a_miss():
+    assert test_generator._select_by_type(mcq(10) + descriptive(3), 10, include_descriptive=True) is None
+    assert test_generator._select_by_type(descriptive(10), 5, include_descriptive=False) is None
+
+class ShortBackend(FakeBackend):
+    """Fake backend that answers every generation call with a single question"""
+
+    def respond(self, kind, prompt):
+        return json.dumps(json.loads(super().respond(kind, prompt))[:1])
+
+def test_short_generation_returns_the_partial_set(monkeypatch):
+    monkeypatch.setattr(llm_scheduler, "ENABLED", False)
+    monkeypatch.setattr(llm_telemetry, "ENABLED", False)
+    monkeypatch.setattr(llm, "breaker", llm.CircuitBreaker())
+    monkeypatch.setattr(llm, "_backend", ShortBackend(sleep=False, failure_rate=0))
+
+    success, questions = test_generator._generate_questions("Python", "medium", 5)
+    assert success
+    assert len(questions) == test_generator.GENERATION_ROUNDS
+    assert all(q['type'] == "MCQ" for q in questions)
+
+class FakeClock:
+    """Clock that only moves when a test advances it.
+
+    Reads from the thread that created it (the grading loop) are counted, so a
+    fake call can stay in flight until the loop has checked its timeout.
+    """
+
+    def __init__(self):
+        self.now = 0.0
+        self.reads = 0
+        self.owner = threading.current_thread()
+        self.changed = threading.Condition()
+
+    def __call__(self):
+        with self.changed:
+            if threading.current_thread() is self.owner:
+                self.reads += 1
+                self.changed.notify_all()
+            return self.now
+
+    def run_for(self, seconds):
+        """Advance the clock, then return once the loop has seen the new time twice"""
+        with self.changed:
+            self.now += seconds
+            target = self.reads + 2
+            self.changed.wait_for(lambda: self.reads >= target, timeout=5)
+
+def test_grading_timeout_runs_from_each_call_start(monkeypatch):
+    clock = FakeClock()
+    release = threading.Event()
+
+    def evaluate(question, correct_answer, user_answer, topic):
+        if question == "hangs":
+            release.wait(5)
+        else:
+            # Each queued answer takes 0.2s, so the batch as a whole outlasts the 0.3s timeout
+            clock.run_for(0.2)
+        return True, 90, "ok"
+    monkeypatch.setattr(test_generator, "evaluate_descriptive_answer", evaluate)
+    monkeypatch.setattr(test_generator, "_clock", clock)
+    monkeypatch.setattr(llm_telemetry, "ENABLED", False)
+
+    answers = [{'question': q, 'correct_answer': "a b c", 'user_answer': "a b"} for q in ("hangs", "q1", "q2", "q3")]
+    try:
+        results = test_generator.evaluate_descriptive_answers(answers, "Topic", max_workers=2, timeout=0.3,
+                                                              mode='concurrent')
+    finally:
+        release.set()
+
+    # Only the hung call falls back; the queued answers each get their own 0.3s
+    assert [r[2] for r in results[1:]] == ["ok"] * 3
+    assert results[0][2] != "ok"
@@ -0,0 +1,126 @@
+# utils/chat_memory.py - Rolling conversation memory for the AI mentor chat
+#
+# Each chat session keeps a running summary in chat_summaries together with
+# how many of the session's messages it covers. Every SUMMARY_EVERY_TURNS
+# turns the messages that have aged out of the recent window are folded into
+# the summary in the background. Prompts are built from the system prompt,
+# the summary and as many recent messages as fit in RECENT_TOKEN_BUDGET.
+
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Set, Tuple
+
+from utils import llm
+from utils.text import estimate_tokens
+
+# Estimated token budget for raw recent messages in a prompt
+RECENT_TOKEN_BUDGET = int(os.environ.get("GAPMENTOR_CHAT_TOKEN_BUDGET", "1500"))
+
+# Turns (user + assistant message pairs) between summary updates
+SUMMARY_EVERY_TURNS = int(os.environ.get("GAPMENTOR_CHAT_SUMMARY_TURNS", "4"))
+
+# Most recent messages always kept verbatim rather than summarized
+KEEP_RECENT_MESSAGES = 6
+
+def get_summary(session_id: int) -> Tuple[str, int]:
+    """A session's summary and how many of its messages it covers"""
+    from utils.database import get_connection
+
+    conn = get_connection()
+    row = conn.execute("""
+        SELECT summary, summarized_count
+        FROM chat_summaries
+        WHERE session_id = ?
+    """, (session_id,)).fetchone()
+    conn.close()
+
+    if not row:
+        return "", 0
+    return row['summary'], row['summarized_count']
+
+def build_prompt(session_id: int, system_prompt: str, messages: List[Dict],
+                 token_budget: int = None) -> str:
+    """Prompt for the next reply: system prompt, running summary, then recent messages within budget"""
+    token_budget = RECENT_TOKEN_BUDGET if token_budget is None else token_budget
+    summary, summarized_count = get_summary(session_id)
+
+    # Newest first until the budget is spent; the latest message always goes in
+    recent, used = [], 0
+    for msg in reversed(messages[summarized_count:]):
+        line = f"{msg['role']}: {msg['content']}\n"
+        cost = estimate_tokens(line)
+        if recent and used + cost > token_budget:
+            break
+        recent.append(line)
+        used += cost
+
+    prompt = system_prompt
+    if summary:
+        prompt += f"\n\nSummary of the earlier conversation:\n{summary}"
+    prompt += "\n\nConversation:\n" + "".join(reversed(recent))
+    return prompt
+
+def _summary_prompt(previous: str, messages: List[Dict]) -> str:
+    turns = "".join(f"{msg['role']}: {msg['content']}\n" for msg in messages)
+    return f"""You maintain the running memory of a tutoring conversation between a student and an AI learning mentor.
+
+Current summary:
+{previous or "(none yet)"}
+
+New messages to fold in:
+{turns}
+Write an updated summary in at most 200 words. Keep the topics covered, what the student
+understood or struggled with, their goals, and anything the mentor promised to follow up on.
+Return only the summary text.
+"""
+
+def update_summary(session_id: int, messages: List[Dict]) -> bool:
+    """Fold messages that left the recent window into the session summary, if enough have built up"""
+    from utils.database import get_connection
+
+    summary, summarized_count = get_summary(session_id)
+    target = len(messages) - KEEP_RECENT_MESSAGES
+    if target - summarized_count < SUMMARY_EVERY_TURNS * 2:
+        return False
+
+    try:
+        new_summary = llm.summarize(_summary_prompt(summary, messages[summarized_count:target])).strip()
+    except Exception as e:
+        print(f"Chat summary error: {e}")
+        return False
+    if not new_summary:
+        return False
+
+    with get_connection() as conn:
+        conn.execute("""
+            INSERT OR REPLACE INTO chat_summaries (session_id, summary, summarized_count, updated_at)
+            VALUES (?, ?, ?, CURRENT_TIMESTAMP)
+        """, (session_id, new_summary, target))
+    return True
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_pid: Optional[int] = None
+_in_flight: Set[int] = set()
+_state_lock = threading.Lock()
+
+def schedule_summary(session_id: int, messages: List[Dict]):
+    """Update the session summary in the background unless an update is already running"""
+    global _executor, _executor_pid
+    with _state_lock:
+        if _executor is None or _executor_pid != os.getpid():
+            _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="gapmentor-chat-memory")
+            _executor_pid = os.getpid()
+            _in_flight.clear()
+        if session_id in _in_flight:
+            return
+        _in_flight.add(session_id)
+
+    def run():
+        try:
+            update_summary(session_id, messages)
+        finally:
+            with _state_lock:
+                _in_flight.discard(session_id)
+
+    _executor.submit(run)
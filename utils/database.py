@@ -2,16 +2,179 @@
 
 import sqlite3
 import os
+import json
+import hashlib
+import queue
+import threading
+import time
 from datetime import datetime
 from typing import Optional, List, Dict, Tuple
+from utils.migrations import apply_migrations, USER_STATS_REBUILD_SQL
+from utils.text import normalize_topic
+from utils import write_behind, near_duplicates, seen_filter
 
 DATABASE_PATH = "gapMentorAI.db"
 
+# Maximum number of idle connections kept warm per database file.
+# 0 disables pooling (every get_connection() opens a fresh connection).
+POOL_SIZE = int(os.environ.get("GAPMENTOR_DB_POOL_SIZE", "8"))
+
+# PRAGMAs applied to every new connection. "rollback" is SQLite's default
+# rollback-journal behaviour; "concurrent" uses WAL so readers never block on
+# writers and many Streamlit sessions can share one database file.
+PRAGMA_PROFILES = {
+    'rollback': {
+        'journal_mode': 'DELETE',
+        'busy_timeout': 5000,
+    },
+    'concurrent': {
+        'journal_mode': 'WAL',
+        'busy_timeout': 10000,
+        'synchronous': 'NORMAL',
+        'cache_size': -16000,       # negative = KiB, i.e. 16 MB per connection
+        'mmap_size': 134217728,     # 128 MB
+        'temp_store': 'MEMORY',
+    },
+}
+
+DB_PROFILE = os.environ.get("GAPMENTOR_DB_PROFILE", "concurrent")
+
+# Per-PRAGMA overrides on top of the active profile, e.g.
+# GAPMENTOR_DB_PRAGMAS="busy_timeout=20000,synchronous=FULL"
+PRAGMA_OVERRIDES = dict(
+    item.split("=", 1) for item in os.environ.get("GAPMENTOR_DB_PRAGMAS", "").split(",") if "=" in item
+)
+
+def get_pragma_profile(profile: str = None) -> Dict[str, object]:
+    """Resolve the PRAGMA settings for a profile plus any overrides"""
+    name = profile or DB_PROFILE
+    if name not in PRAGMA_PROFILES:
+        raise ValueError(f"Unknown database profile: {name}")
+    pragmas = dict(PRAGMA_PROFILES[name])
+    pragmas.update({k.strip(): v.strip() for k, v in PRAGMA_OVERRIDES.items()})
+    return pragmas
+
+def apply_pragmas(conn: sqlite3.Connection, pragmas: Dict[str, object]):
+    """Apply PRAGMA settings to a connection (journal_mode first)"""
+    for name in sorted(pragmas, key=lambda n: n != 'journal_mode'):
+        conn.execute(f"PRAGMA {name} = {pragmas[name]}")
+
+class PooledConnection:
+    """sqlite3 connection handed out by ConnectionPool.
+
+    Behaves like a regular connection; close() returns it to the pool
+    instead of closing it. Used as a context manager it commits on success,
+    rolls back on error and releases the connection on exit.
+    """
+
+    def __init__(self, pool: "ConnectionPool", conn: sqlite3.Connection):
+        self._pool = pool
+        self._conn = conn
+
+    def __getattr__(self, name):
+        if self._conn is None:
+            raise sqlite3.ProgrammingError("Cannot operate on a closed database.")
+        return getattr(self._conn, name)
+
+    def close(self):
+        """Return the connection to its pool"""
+        if self._conn is not None:
+            conn, self._conn = self._conn, None
+            self._pool.release(conn)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            if self._conn is not None:
+                if exc_type is None:
+                    self._conn.commit()
+                else:
+                    self._conn.rollback()
+        finally:
+            self.close()
+        return False
+
+class ConnectionPool:
+    """Bounded pool of warm sqlite3 connections for one database file"""
+
+    def __init__(self, path: str, max_size: int = None, profile: str = None):
+        self.path = path
+        self.max_size = POOL_SIZE if max_size is None else max_size
+        self.pragmas = get_pragma_profile(profile)
+        self._idle = queue.LifoQueue(maxsize=self.max_size) if self.max_size > 0 else None
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        apply_pragmas(conn, self.pragmas)
+        return conn
+
+    def acquire(self) -> PooledConnection:
+        """Borrow a connection, opening a new one if none are idle"""
+        conn = None
+        if self._idle is not None:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                conn = None
+        if conn is None:
+            conn = self._connect()
+        return PooledConnection(self, conn)
+
+    def release(self, conn: sqlite3.Connection):
+        """Return a connection; uncommitted work is discarded like on close()"""
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
+            conn.close()
+            return
+
+        if self._idle is None:
+            conn.close()
+            return
+        try:
+            self._idle.put_nowait(conn)
+        except queue.Full:
+            conn.close()
+
+    def close_all(self):
+        """Close every idle connection"""
+        if self._idle is None:
+            return
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+
+_pools: Dict[Tuple[int, str], ConnectionPool] = {}
+_pools_lock = threading.Lock()
+
+def get_pool(path: str = None) -> ConnectionPool:
+    """Get this process's connection pool for a database file"""
+    key = (os.getpid(), path or DATABASE_PATH)
+    pool = _pools.get(key)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.get(key)
+            if pool is None:
+                pool = ConnectionPool(key[1])
+                _pools[key] = pool
+    return pool
+
+def close_pools():
+    """Close idle pooled connections (e.g. after changing DATABASE_PATH or DB_PROFILE)"""
+    with _pools_lock:
+        for pool in _pools.values():
+            pool.close_all()
+        _pools.clear()
+
 def get_connection():
-    """Get database connection"""
-    conn = sqlite3.connect(DATABASE_PATH, check_same_thread=False)
-    conn.row_factory = sqlite3.Row
-    return conn
+    """Get database connection (pooled; close() returns it to the pool)"""
+    return get_pool().acquire()
 
 def init_db():
     """Initialize database with all required tables"""
@@ -178,6 +341,9 @@ def init_db():
     """)
     
     conn.commit()
+    
+    # Bring indexes and derived tables up to the latest schema version
+    apply_migrations(conn)
     conn.close()
 
 def create_user(username: str, email: str, password_hash: str, full_name: str = None) -> Tuple[bool, str]:
@@ -261,7 +427,7 @@ def create_test(user_id: int, topic: str, difficulty: str, total_questions: int,
     conn = get_connection()
     cursor = conn.cursor()
     
-    topic_normalized = topic.lower().strip()
+    topic_normalized = normalize_topic(topic)
     
     cursor.execute("""
         INSERT INTO tests (user_id, topic, topic_normalized, difficulty, total_questions, include_descriptive)
@@ -274,20 +440,124 @@ def create_test(user_id: int, topic: str, difficulty: str, total_questions: int,
     
     return test_id
 
+def question_hash(question_text: str) -> str:
+    """Hash of a question's text, normalized for case and whitespace"""
+    normalized = " ".join(question_text.lower().split())
+    return hashlib.sha1(normalized.encode('utf-8')).hexdigest()[:16]
+
+def get_seen_question_hashes(user_id: int, topic: str, hashes: List[str]) -> set:
+    """Which of the given question hashes the user has already seen on this topic"""
+    topic_normalized = normalize_topic(topic)
+    hashes = list(dict.fromkeys(hashes))
+    seen = set()
+    
+    conn = get_connection()
+    # The Bloom filter rules out unseen questions in memory; only its
+    # positive hits (seen questions or false positives) go to the database
+    maybe_seen = seen_filter.possibly_seen(conn, user_id, topic_normalized, hashes)
+    hashes = [h for h in hashes if maybe_seen[h]]
+    
+    # Chunked to stay under SQLite's variable limit
+    for start in range(0, len(hashes), 500):
+        chunk = hashes[start:start + 500]
+        rows = conn.execute(f"""
+            SELECT DISTINCT q.question_hash
+            FROM questions q
+            JOIN tests t ON q.test_id = t.id
+            WHERE t.user_id = ?
+            AND t.topic_normalized = ?
+            AND q.question_hash IN ({', '.join('?' * len(chunk))})
+        """, (user_id, topic_normalized, *chunk)).fetchall()
+        seen.update(row['question_hash'] for row in rows)
+    conn.close()
+    
+    return seen
+
 def save_question(test_id: int, question_number: int, question_text: str, question_type: str, 
                   options: str, correct_answer: str):
     """Save a question to the database"""
     conn = get_connection()
     cursor = conn.cursor()
     
+    owner = _test_owner(conn, test_id)
+    topic_normalized = owner[1] if owner else ""
     cursor.execute("""
-        INSERT INTO questions (test_id, question_number, question_text, question_type, options, correct_answer)
-        VALUES (?, ?, ?, ?, ?, ?)
-    """, (test_id, question_number, question_text, question_type, options, correct_answer))
+        INSERT INTO questions (test_id, question_number, question_text, question_type, options, correct_answer,
+                               question_hash, minhash)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    """, (test_id, question_number, question_text, question_type, options, correct_answer,
+          question_hash(question_text),
+          near_duplicates.to_blob(near_duplicates.signature(question_text, topic_normalized))))
+    if owner:
+        _record_seen(conn, test_id, [question_hash(question_text)], *owner)
     
     conn.commit()
     conn.close()
 
+def _question_rows(test_id: int, questions: List[Dict], topic_normalized: str,
+                   start_number: int = 1) -> List[tuple]:
+    """Convert generated question dicts into questions table rows"""
+    rows = []
+    for number, q in enumerate(questions, start_number):
+        options = q.get('options')
+        rows.append((
+            test_id,
+            number,
+            q['question'],
+            q['type'],
+            json.dumps(options) if options else None,
+            q['correct_answer'],
+            question_hash(q['question']),
+            near_duplicates.to_blob(near_duplicates.signature(q['question'], topic_normalized))
+        ))
+    return rows
+
+def _test_owner(conn, test_id: int) -> Optional[Tuple[int, str]]:
+    """(user_id, topic_normalized) of a test, or None if it does not exist"""
+    row = conn.execute("SELECT user_id, topic_normalized FROM tests WHERE id = ?", (test_id,)).fetchone()
+    return (row['user_id'], row['topic_normalized']) if row else None
+
+def _record_seen(conn, test_id: int, hashes: List[str], user_id: int, topic_normalized: str):
+    """Add saved question hashes to the test owner's seen-question filter (same transaction)"""
+    seen_filter.add_hashes(conn, user_id, topic_normalized, hashes)
+
+def save_questions(test_id: int, questions: List[Dict], start_number: int = 1):
+    """Save a batch of generated questions in a single transaction"""
+    with get_connection() as conn:
+        owner = _test_owner(conn, test_id)
+        rows = _question_rows(test_id, questions, owner[1] if owner else "", start_number)
+        conn.executemany("""
+            INSERT INTO questions (test_id, question_number, question_text, question_type, options, correct_answer,
+                                   question_hash, minhash)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        """, rows)
+        if owner:
+            _record_seen(conn, test_id, [row[6] for row in rows], *owner)
+
+def create_test_with_questions(user_id: int, topic: str, difficulty: str, questions: List[Dict],
+                               include_descriptive: bool = False) -> int:
+    """Create a test and save all its questions atomically"""
+    topic_normalized = normalize_topic(topic)
+    
+    # Either the test and every question are committed, or nothing is
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            INSERT INTO tests (user_id, topic, topic_normalized, difficulty, total_questions, include_descriptive)
+            VALUES (?, ?, ?, ?, ?, ?)
+        """, (user_id, topic, topic_normalized, difficulty, len(questions), int(include_descriptive)))
+        test_id = cursor.lastrowid
+        
+        rows = _question_rows(test_id, questions, topic_normalized)
+        cursor.executemany("""
+            INSERT INTO questions (test_id, question_number, question_text, question_type, options, correct_answer,
+                                   question_hash, minhash)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        """, rows)
+        _record_seen(conn, test_id, [row[6] for row in rows], user_id, topic_normalized)
+    
+    return test_id
+
 def save_user_answer(test_id: int, question_number: int, user_answer: str, is_correct: bool):
     """Save user's answer to a question"""
     conn = get_connection()
@@ -316,6 +586,29 @@ def complete_test(test_id: int, score: float):
     conn.commit()
     conn.close()
 
+def submit_test_results(test_id: int, answers: List[Dict], score: float) -> float:
+    """Save all answers and complete the test in one transaction.
+    
+    answers holds dicts with question_number, user_answer and is_correct.
+    Returns the time taken in milliseconds.
+    """
+    start = time.perf_counter()
+    
+    with get_connection() as conn:
+        conn.executemany("""
+            UPDATE questions 
+            SET user_answer = ?, is_correct = ?
+            WHERE test_id = ? AND question_number = ?
+        """, [(a['user_answer'], int(a['is_correct']), test_id, a['question_number']) for a in answers])
+        
+        conn.execute("""
+            UPDATE tests 
+            SET completed = 1, score = ?, completed_at = CURRENT_TIMESTAMP
+            WHERE id = ?
+        """, (score, test_id))
+    
+    return (time.perf_counter() - start) * 1000
+
 def get_user_tests(user_id: int, limit: int = None) -> List[Dict]:
     """Get user's test history"""
     conn = get_connection()
@@ -327,60 +620,218 @@ def get_user_tests(user_id: int, limit: int = None) -> List[Dict]:
         ORDER BY created_at DESC
     """
     
+    params = [user_id]
+    
     if limit:
-        query += f" LIMIT {limit}"
+        query += " LIMIT ?"
+        params.append(int(limit))
     
-    cursor.execute(query, (user_id,))
+    cursor.execute(query, params)
     tests = [dict(row) for row in cursor.fetchall()]
     conn.close()
     
     return tests
 
-def get_user_stats(user_id: int) -> Dict:
-    """Get user statistics"""
-    conn = get_connection()
-    cursor = conn.cursor()
+# Sort options for get_test_history: (sort key expression, direction).
+# Every key is paired with the test id so the keyset cursor is unique.
+TEST_HISTORY_SORTS = {
+    'newest': ("created_at", "DESC"),
+    'oldest': ("created_at", "ASC"),
+    'score_high': ("COALESCE(score, -1)", "DESC"),
+    'score_low': ("COALESCE(score, -1)", "ASC"),
+}
+
+def get_test_history(user_id: int, topic: str = None, difficulty: str = None, sort: str = 'newest',
+                     cursor: Tuple = None, page_size: int = 20) -> Tuple[List[Dict], Optional[Tuple]]:
+    """Get one page of a user's test history using keyset pagination.
+    
+    cursor is the value returned with the previous page (None for the first
+    page). Returns the page of tests and the cursor for the next page, which
+    is None on the last page.
+    """
+    sort_key, direction = TEST_HISTORY_SORTS[sort]
+    
+    query = f"""
+        SELECT 
+            id,
+            topic,
+            difficulty,
+            total_questions,
+            score,
+            completed,
+            created_at,
+            completed_at,
+            {sort_key} AS sort_key
+        FROM tests
+        WHERE user_id = ?
+    """
+    params = [user_id]
     
-    # Total tests
-    cursor.execute("SELECT COUNT(*) as count FROM tests WHERE user_id = ? AND completed = 1", (user_id,))
-    total_tests = cursor.fetchone()['count']
+    if topic:
+        query += " AND topic = ?"
+        params.append(topic)
     
-    # Average score
-    cursor.execute("SELECT AVG(score) as avg_score FROM tests WHERE user_id = ? AND completed = 1", (user_id,))
-    avg_score = cursor.fetchone()['avg_score'] or 0
+    if difficulty:
+        query += " AND difficulty = ?"
+        params.append(difficulty)
     
-    # Topics covered
-    cursor.execute("SELECT COUNT(DISTINCT topic_normalized) as count FROM tests WHERE user_id = ? AND completed = 1", (user_id,))
-    topics_covered = cursor.fetchone()['count']
+    # Continue strictly after the last row of the previous page
+    if cursor is not None:
+        query += f" AND ({sort_key}, id) {'<' if direction == 'DESC' else '>'} (?, ?)"
+        params.extend(cursor)
     
-    # Total gaps
-    cursor.execute("SELECT COUNT(*) as count FROM gaps WHERE user_id = ? AND resolved = 0", (user_id,))
-    total_gaps = cursor.fetchone()['count']
+    query += f" ORDER BY {sort_key} {direction}, id {direction} LIMIT ?"
+    params.append(page_size + 1)
     
+    conn = get_connection()
+    rows = [dict(row) for row in conn.execute(query, params).fetchall()]
     conn.close()
     
+    next_cursor = None
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        next_cursor = (rows[-1]['sort_key'], rows[-1]['id'])
+    
+    for row in rows:
+        del row['sort_key']
+    
+    return rows, next_cursor
+
+def get_user_stats(user_id: int) -> Dict:
+    """Get user statistics (materialized in user_stats, kept current by triggers)"""
+    conn = get_connection()
+    cursor = conn.cursor()
+    
+    cursor.execute("SELECT * FROM user_stats WHERE user_id = ?", (user_id,))
+    row = cursor.fetchone()
+    conn.close()
+    
+    if not row:
+        return {'total_tests': 0, 'average_score': 0, 'topics_covered': 0, 'total_gaps': 0}
+    
+    avg_score = row['score_sum'] / row['scored_tests'] if row['scored_tests'] else 0
+    
     return {
-        'total_tests': total_tests,
+        'total_tests': row['total_tests'],
         'average_score': round(avg_score, 1),
-        'topics_covered': topics_covered,
-        'total_gaps': total_gaps
+        'topics_covered': row['topics_covered'],
+        'total_gaps': row['total_gaps']
     }
 
-def create_notification(user_id: int, notif_type: str, title: str, content: str, action_url: str = None):
-    """Create a new notification"""
+def rebuild_user_stats(user_id: int = None):
+    """Recompute user_stats from the tests and gaps tables"""
+    with get_connection() as conn:
+        if user_id is None:
+            conn.execute("DELETE FROM user_stats")
+            conn.execute(USER_STATS_REBUILD_SQL.format(where=""))
+        else:
+            conn.execute("DELETE FROM user_stats WHERE user_id = ?", (user_id,))
+            conn.execute(USER_STATS_REBUILD_SQL.format(where="WHERE u.user_id = ?"), (user_id,))
+
+def check_user_stats(repair: bool = False) -> List[int]:
+    """Compare user_stats with the base tables and return mismatched user ids.
+    
+    With repair=True, mismatched rows are rebuilt.
+    """
     conn = get_connection()
     cursor = conn.cursor()
     
+    # Recompute every user's stats into a temp table and diff against user_stats
+    cursor.execute("DROP TABLE IF EXISTS temp.user_stats_expected")
+    cursor.execute("CREATE TEMP TABLE user_stats_expected AS SELECT * FROM user_stats WHERE 0")
+    cursor.execute(USER_STATS_REBUILD_SQL.replace("INTO user_stats", "INTO temp.user_stats_expected").format(where=""))
     cursor.execute("""
+        SELECT ids.user_id
+        FROM (SELECT user_id FROM temp.user_stats_expected UNION SELECT user_id FROM user_stats) ids
+        LEFT JOIN temp.user_stats_expected e ON e.user_id = ids.user_id
+        LEFT JOIN user_stats s ON s.user_id = ids.user_id
+        WHERE COALESCE(e.total_tests, 0) != COALESCE(s.total_tests, 0)
+        OR COALESCE(e.scored_tests, 0) != COALESCE(s.scored_tests, 0)
+        OR ABS(COALESCE(e.score_sum, 0) - COALESCE(s.score_sum, 0)) > 0.001
+        OR COALESCE(e.topics_covered, 0) != COALESCE(s.topics_covered, 0)
+        OR COALESCE(e.total_gaps, 0) != COALESCE(s.total_gaps, 0)
+    """)
+    mismatched = [row['user_id'] for row in cursor.fetchall()]
+    cursor.execute("DROP TABLE temp.user_stats_expected")
+    conn.commit()
+    conn.close()
+    
+    if repair:
+        for user_id in mismatched:
+            rebuild_user_stats(user_id)
+    
+    return mismatched
+
+def create_notification(user_id: int, notif_type: str, title: str, content: str, action_url: str = None,
+                        wait: bool = False):
+    """Create a new notification (written in the background unless wait=True)"""
+    write_behind.submit([("""
         INSERT INTO notifications (user_id, type, title, content, action_url)
         VALUES (?, ?, ?, ?, ?)
-    """, (user_id, notif_type, title, content, action_url))
+    """, (user_id, notif_type, title, content, action_url))])
     
-    conn.commit()
+    if wait:
+        write_behind.flush()
+
+def save_chat_message(session_id: int, role: str, content: str, ttft_ms: float = None,
+                      total_ms: float = None, partial: bool = False):
+    """Save a chat message and bump the session's activity (written in the background)
+
+    Streamed assistant replies also record time-to-first-token and total time;
+    partial marks a reply that was cut off when the stream broke.
+    """
+    write_behind.submit([
+        ("""
+            INSERT INTO chat_messages (session_id, role, content, ttft_ms, total_ms, partial)
+            VALUES (?, ?, ?, ?, ?, ?)
+        """, (session_id, role, content, ttft_ms, total_ms, int(partial))),
+        ("""
+            UPDATE chat_sessions
+            SET last_activity = CURRENT_TIMESTAMP
+            WHERE id = ?
+        """, (session_id,))
+    ])
+
+def percentile(values: List[float], pct: float) -> Optional[float]:
+    """Nearest-rank percentile of the non-null values, rounded for reports"""
+    values = sorted(v for v in values if v is not None)
+    if not values:
+        return None
+    return round(values[min(len(values) - 1, int(len(values) * pct / 100))], 1)
+
+def get_chat_latency_report(days: int = 7) -> Dict:
+    """p50/p95 time-to-first-token and total time of streamed chat replies"""
+    flush_writes()
+    
+    conn = get_connection()
+    rows = conn.execute("""
+        SELECT ttft_ms, total_ms, partial
+        FROM chat_messages
+        WHERE role = 'assistant' AND total_ms IS NOT NULL
+          AND timestamp >= datetime('now', ?)
+    """, (f"-{int(days)} days",)).fetchall()
     conn.close()
+    
+    ttft = [row['ttft_ms'] for row in rows]
+    total = [row['total_ms'] for row in rows]
+    return {
+        'turns': len(rows),
+        'partial': sum(row['partial'] or 0 for row in rows),
+        'ttft_p50_ms': percentile(ttft, 50),
+        'ttft_p95_ms': percentile(ttft, 95),
+        'total_p50_ms': percentile(total, 50),
+        'total_p95_ms': percentile(total, 95)
+    }
+
+def flush_writes(timeout: float = 10.0) -> bool:
+    """Wait until all background writes queued by this process are committed"""
+    return write_behind.flush(timeout)
 
 def get_user_notifications(user_id: int, unread_only: bool = False) -> List[Dict]:
     """Get user notifications"""
+    # Include notifications still waiting in the write-behind queue
+    flush_writes()
+    
     conn = get_connection()
     cursor = conn.cursor()
     
@@ -0,0 +1,381 @@
+# utils/llm.py - Shared Gemini client for GapMentorAI
+#
+# The API is configured and each model is built once per process, then
+# shared by every Streamlit session. All LLM traffic goes through the typed
+# calls below, so the model used for each kind of call is chosen here.
+#
+# Calls are retried with jittered exponential backoff on transient errors
+# (429, 5xx, timeouts) within a per-kind deadline. A process-wide circuit
+# breaker opens after repeated transient failures and fast-fails calls with
+# LLMUnavailableError, so callers drop straight to their fallbacks until the
+# provider recovers.
+#
+# The provider itself is a pluggable backend: GeminiBackend by default, the
+# offline FakeBackend from utils/llm_fake.py with GAPMENTOR_LLM_BACKEND=fake,
+# or the cassette recorder/player from utils/llm_cassette.py (record/replay).
+
+import os
+import random
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Dict, Iterator, Optional
+
+from utils import llm_scheduler, llm_telemetry
+
+# Model used for each kind of call
+MODELS = {
+    'generate': 'gemini-2.5-flash',   # test question generation
+    'evaluate': 'gemini-2.5-flash',   # descriptive answer grading
+    'analyze': 'gemini-pro',          # learning gap analysis
+    'plan': 'gemini-pro',             # study plan generation
+    'chat': 'gemini-2.5-flash',       # AI mentor chat
+    'summarize': 'gemini-2.5-flash',  # rolling chat summaries
+}
+
+# Total time budget per call, retries included (seconds)
+DEADLINES = {
+    'generate': 90.0,
+    'evaluate': 30.0,
+    'analyze': 45.0,
+    'plan': 90.0,
+    'chat': 60.0,
+    'summarize': 30.0,
+}
+
+# Attempts per call and backoff between them (seconds)
+MAX_ATTEMPTS = int(os.environ.get("GAPMENTOR_LLM_ATTEMPTS", "3"))
+BACKOFF_BASE = 0.5
+BACKOFF_MAX = 8.0
+
+# Consecutive transient failures that open the breaker, and how long it stays open
+BREAKER_THRESHOLD = int(os.environ.get("GAPMENTOR_LLM_BREAKER_THRESHOLD", "5"))
+BREAKER_COOLDOWN = float(os.environ.get("GAPMENTOR_LLM_BREAKER_COOLDOWN", "30"))
+
+TRANSIENT_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+
+class LLMUnavailableError(RuntimeError):
+    """Raised without calling the provider while the circuit breaker is open"""
+
+class LLMConfigurationError(RuntimeError):
+    """No Gemini API key is configured"""
+
+class CircuitBreaker:
+    """Closed -> open after `threshold` consecutive failures -> half-open after `cooldown`"""
+
+    def __init__(self, threshold: int = BREAKER_THRESHOLD, cooldown: float = BREAKER_COOLDOWN):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.state = 'closed'
+        self.failures = 0
+        self.opened_at = 0.0
+        self.times_opened = 0
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        """Whether a call may go to the provider now"""
+        with self._lock:
+            if self.state == 'open' and time.monotonic() - self.opened_at >= self.cooldown:
+                self.state = 'half_open'
+                self._trial_in_flight = False
+            if self.state == 'closed':
+                return True
+            if self.state == 'half_open' and not self._trial_in_flight:
+                # Let a single trial call through to probe the provider
+                self._trial_in_flight = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.state = 'closed'
+            self.failures = 0
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._trial_in_flight = False
+            if self.state == 'half_open' or self.failures >= self.threshold:
+                if self.state != 'open':
+                    self.times_opened += 1
+                self.state = 'open'
+                self.opened_at = time.monotonic()
+
+    def release_trial(self):
+        """Free the half-open trial slot of a call that ended without an outcome"""
+        with self._lock:
+            if self.state == 'half_open':
+                self._trial_in_flight = False
+
+breaker = CircuitBreaker()
+
+_stats = {
+    'calls': 0,
+    'successes': 0,
+    'failures': 0,
+    'retries': 0,
+    'short_circuited': 0,
+    'deadline_exceeded': 0,
+    'queue_timeouts': 0,
+}
+_stats_lock = threading.Lock()
+
+def _count(name: str, amount: int = 1):
+    with _stats_lock:
+        _stats[name] += amount
+
+def get_resilience_stats() -> Dict:
+    """Call counters and circuit breaker state for this process"""
+    with _stats_lock:
+        stats = dict(_stats)
+    stats['breaker_state'] = breaker.state
+    stats['breaker_failures'] = breaker.failures
+    stats['breaker_opened'] = breaker.times_opened
+    return stats
+
+def _status_code(error: Exception) -> Optional[int]:
+    """HTTP-like status code of a provider error, if it carries one"""
+    code = getattr(error, 'code', None)
+    if callable(code):
+        code = code()
+    code = getattr(code, 'value', code)
+    return code if isinstance(code, int) else None
+
+def is_transient(error: Exception) -> bool:
+    """Rate limits, server errors and timeouts are worth retrying"""
+    code = _status_code(error)
+    if code in TRANSIENT_STATUS_CODES:
+        return True
+    if isinstance(error, (TimeoutError, ConnectionError)):
+        return True
+    return type(error).__name__ in {
+        'ResourceExhausted', 'TooManyRequests', 'ServiceUnavailable', 'InternalServerError',
+        'DeadlineExceeded', 'GatewayTimeout', 'BadGateway', 'RetryError',
+    }
+
+def _backoff(attempt: int) -> float:
+    """Full-jitter exponential backoff before retry number `attempt` (1-based)"""
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt))
+
+def _with_retries(kind: str, request, call: llm_telemetry.CallRecord = None):
+    """Run request(timeout) under the breaker, retrying transient errors until the deadline"""
+    _count('calls')
+    deadline = time.monotonic() + DEADLINES[kind]
+    attempt = 0
+    while True:
+        if not breaker.allow():
+            _count('short_circuited')
+            raise LLMUnavailableError(f"Gemini unavailable (circuit open), skipping {kind} call")
+
+        # Every exit below must settle the breaker, or a half-open trial never ends
+        settled = False
+        try:
+            # Wait for a slot in the shared quota; queueing time does not count against the deadline
+            try:
+                deadline += llm_scheduler.acquire(kind)
+            except llm_scheduler.QueueTimeoutError as e:
+                _count('queue_timeouts')
+                raise LLMUnavailableError(f"Gemini busy, skipping {kind} call: {e}") from e
+
+            attempt += 1
+            if call is not None:
+                call.attempts = attempt
+            try:
+                result = request(max(1.0, deadline - time.monotonic()))
+            except Exception as e:
+                if not is_transient(e):
+                    # Bad prompt, safety block, bad key, etc.: the provider answered, so it is healthy
+                    breaker.record_success()
+                    settled = True
+                    _count('failures')
+                    raise
+                breaker.record_failure()
+                settled = True
+                if _status_code(e) == 429 or type(e).__name__ in ('ResourceExhausted', 'TooManyRequests'):
+                    # Quota exceeded: make every process wait for the bucket to refill
+                    llm_scheduler.throttle()
+                delay = _backoff(attempt)
+                out_of_time = time.monotonic() + delay >= deadline
+                if out_of_time:
+                    _count('deadline_exceeded')
+                if attempt >= MAX_ATTEMPTS or out_of_time:
+                    _count('failures')
+                    raise
+                _count('retries')
+                time.sleep(delay)
+                continue
+
+            breaker.record_success()
+            settled = True
+            _count('successes')
+            return result
+        finally:
+            if not settled:
+                breaker.release_trial()
+
+_models: Dict[str, object] = {}
+_configured = False
+_lock = threading.Lock()
+
+def get_api_key() -> str:
+    """Read the Gemini API key from the GEMINI_API_KEY environment variable or Streamlit secrets"""
+    key = os.environ.get("GEMINI_API_KEY")
+    if key:
+        return key
+    try:
+        import streamlit as st
+        key = st.secrets["GEMINI_API_KEY"]
+    except Exception:
+        key = None
+    if not key:
+        raise LLMConfigurationError(
+            "No Gemini API key: set GEMINI_API_KEY in .streamlit/secrets.toml or the environment, "
+            "or run offline with GAPMENTOR_LLM_BACKEND=fake")
+    return key
+
+def get_model(kind: str):
+    """Get the process-wide Gemini model for a call kind, building it on first use"""
+    global _configured
+    import google.generativeai as genai
+    
+    model_name = MODELS[kind]
+    model = _models.get(model_name)
+    if model is None:
+        with _lock:
+            if not _configured:
+                genai.configure(api_key=get_api_key())
+                _configured = True
+            model = _models.get(model_name)
+            if model is None:
+                model = genai.GenerativeModel(model_name)
+                _models[model_name] = model
+    return model
+
+class Backend(ABC):
+    """Interface of an LLM provider: one text completion, or a stream of text chunks"""
+    
+    name = "base"
+    
+    @abstractmethod
+    def generate(self, kind: str, prompt: str, timeout: float) -> str:
+        """Complete a prompt within timeout seconds"""
+    
+    def stream(self, kind: str, prompt: str, timeout: float) -> Iterator[str]:
+        """Stream a completion; backends without streaming send it as one chunk"""
+        yield self.generate(kind, prompt, timeout)
+
+class GeminiBackend(Backend):
+    """Google Gemini through google-generativeai"""
+    
+    name = "gemini"
+    
+    def generate(self, kind: str, prompt: str, timeout: float) -> str:
+        return get_model(kind).generate_content(prompt, request_options={'timeout': timeout}).text
+    
+    def stream(self, kind: str, prompt: str, timeout: float) -> Iterator[str]:
+        response = get_model(kind).generate_content(prompt, stream=True, request_options={'timeout': timeout})
+        for chunk in response:
+            # Chunks without text parts (e.g. safety metadata) raise on .text
+            try:
+                text = chunk.text
+            except ValueError:
+                continue
+            if text:
+                yield text
+
+_backend: Optional[Backend] = None
+
+def get_backend() -> Backend:
+    """The process-wide backend, chosen by GAPMENTOR_LLM_BACKEND ('gemini', 'fake', 'record' or 'replay')"""
+    global _backend
+    if _backend is None:
+        with _lock:
+            if _backend is None:
+                name = os.environ.get("GAPMENTOR_LLM_BACKEND", "gemini").lower()
+                if name == "fake":
+                    from utils.llm_fake import FakeBackend
+                    _backend = FakeBackend.from_env()
+                elif name in ("record", "replay"):
+                    from utils.llm_cassette import backend_from_env
+                    _backend = backend_from_env(name)
+                elif name == "gemini":
+                    _backend = GeminiBackend()
+                else:
+                    raise ValueError(f"Unknown LLM backend: {name}")
+    return _backend
+
+def set_backend(backend: Optional[Backend]):
+    """Swap the backend (None goes back to the environment default on next use)"""
+    global _backend
+    with _lock:
+        _backend = backend
+
+def _call(kind: str, prompt: str) -> str:
+    """Send a prompt to the backend for this call kind and return the response text"""
+    backend = get_backend()
+    call = llm_telemetry.CallRecord(kind, prompt, backend.name)
+    try:
+        response = _with_retries(kind, lambda timeout: backend.generate(kind, prompt, timeout), call)
+    except Exception as e:
+        call.finish(error=e)
+        raise
+    call.finish(response)
+    return response
+
+def _stream(kind: str, prompt: str) -> Iterator[str]:
+    """Send a prompt and yield the response text chunk by chunk as it arrives.
+    
+    Retries only cover opening the stream and waiting for the first chunk;
+    once text has been yielded, a failure is raised to the caller.
+    """
+    backend = get_backend()
+    call = llm_telemetry.CallRecord(kind, prompt, backend.name)
+    received = []
+    
+    def first_chunk(timeout):
+        chunks = iter(backend.stream(kind, prompt, timeout))
+        return chunks, next(chunks, None)
+    
+    try:
+        chunks, text = _with_retries(kind, first_chunk, call)
+        call.first_byte()
+        while text is not None:
+            received.append(text)
+            yield text
+            text = next(chunks, None)
+    except Exception as e:
+        call.finish("".join(received), error=e)
+        raise
+    finally:
+        # Also reached when the caller stops reading early
+        call.finish("".join(received))
+
+def generate(prompt: str) -> str:
+    """Generate test questions"""
+    return _call('generate', prompt)
+
+def evaluate(prompt: str) -> str:
+    """Grade a descriptive answer"""
+    return _call('evaluate', prompt)
+
+def analyze(prompt: str) -> str:
+    """Analyze incorrect answers for learning gaps"""
+    return _call('analyze', prompt)
+
+def plan(prompt: str) -> str:
+    """Generate a study plan"""
+    return _call('plan', prompt)
+
+def chat(prompt: str) -> str:
+    """Answer a mentor chat turn"""
+    return _call('chat', prompt)
+
+def chat_stream(prompt: str) -> Iterator[str]:
+    """Answer a mentor chat turn, streaming the reply"""
+    return _stream('chat', prompt)
+
+def summarize(prompt: str) -> str:
+    """Condense older chat turns into a running summary"""
+    return _call('summarize', prompt)
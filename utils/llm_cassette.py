@@ -0,0 +1,186 @@
+# utils/llm_cassette.py - Record and replay LLM traffic through gzip cassettes
+#
+# RecordingBackend wraps a real backend and appends every attempt (prompt,
+# response or error, latency, and chunk timings for streams) to a gzip JSONL
+# cassette. ReplayBackend serves those responses back offline, sleeping for
+# the recorded latency multiplied by a time scale (1 = original timing,
+# 0 = instant), so caching, batching and parallelism changes can be measured
+# against real payload sizes. A replayed prompt is matched exactly first; when
+# the prompt differs (prompts embed user history), the next unused recording
+# of the same kind is served instead.
+#
+# Enable with GAPMENTOR_LLM_BACKEND=record or replay and tune with:
+#   GAPMENTOR_LLM_CASSETTE            cassette path (default cassettes/llm.jsonl.gz)
+#   GAPMENTOR_CASSETTE_TIME_SCALE     replay latency multiplier (default 1.0)
+#
+# Cassettes hold full prompts, including student answers; keep them local.
+
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+import zlib
+from collections import deque
+from typing import Dict, Iterator, List, Optional
+
+from utils.llm import Backend, GeminiBackend
+
+CASSETTE_PATH = os.environ.get("GAPMENTOR_LLM_CASSETTE", os.path.join("cassettes", "llm.jsonl.gz"))
+TIME_SCALE = float(os.environ.get("GAPMENTOR_CASSETTE_TIME_SCALE", "1.0"))
+
+class CassetteMissError(Exception):
+    """The cassette has no recording of this call kind"""
+
+class ReplayedError(Exception):
+    """A provider error captured while recording, raised again on replay"""
+
+    def __init__(self, code: Optional[int], message: str):
+        super().__init__(message)
+        self.code = code
+
+def prompt_hash(kind: str, prompt: str) -> str:
+    return hashlib.sha1(f"{kind}\n{prompt}".encode('utf-8')).hexdigest()
+
+def _error_code(error: Exception) -> Optional[int]:
+    code = getattr(error, 'code', None)
+    if callable(code):
+        code = code()
+    code = getattr(code, 'value', code)
+    return code if isinstance(code, int) else None
+
+def load(path: str) -> List[Dict]:
+    """Every record in a cassette; a record cut off by a crash ends the list"""
+    records = []
+    try:
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            for line in f:
+                records.append(json.loads(line))
+    except (EOFError, zlib.error, json.JSONDecodeError) as e:
+        print(f"Cassette {path}: stopped after {len(records)} record(s): {e}")
+    return records
+
+class RecordingBackend(Backend):
+    """Pass calls through to another backend and append each one to a cassette"""
+
+    name = "record"
+
+    def __init__(self, inner: Backend, path: str = None):
+        self.inner = inner
+        self.path = path or CASSETTE_PATH
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+
+    def _write(self, record: Dict):
+        # One gzip member per record, so a crash loses at most the last call
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+        with self._lock:
+            with gzip.open(self.path, 'at', encoding='utf-8') as f:
+                f.write(line)
+
+    def _record(self, kind: str, prompt: str, started: float, **fields):
+        self._write(dict({
+            'kind': kind,
+            'prompt_hash': prompt_hash(kind, prompt),
+            'prompt': prompt,
+            'recorded_at': time.time(),
+            'latency_ms': round((time.perf_counter() - started) * 1000, 1),
+        }, **fields))
+
+    def generate(self, kind: str, prompt: str, timeout: float) -> str:
+        started = time.perf_counter()
+        try:
+            response = self.inner.generate(kind, prompt, timeout)
+        except Exception as e:
+            self._record(kind, prompt, started, error={'code': _error_code(e), 'message': str(e)})
+            raise
+        self._record(kind, prompt, started, response=response)
+        return response
+
+    def stream(self, kind: str, prompt: str, timeout: float) -> Iterator[str]:
+        started = time.perf_counter()
+        chunks, error = [], None
+        try:
+            for text in self.inner.stream(kind, prompt, timeout):
+                chunks.append({'text': text, 'offset_ms': round((time.perf_counter() - started) * 1000, 1)})
+                yield text
+        except Exception as e:
+            error = {'code': _error_code(e), 'message': str(e)}
+            raise
+        finally:
+            self._record(kind, prompt, started, response="".join(c['text'] for c in chunks),
+                         chunks=chunks, **({'error': error} if error else {}))
+
+class ReplayBackend(Backend):
+    """Serve recorded responses with original or scaled timing, without network access"""
+
+    name = "replay"
+
+    def __init__(self, path: str = None, time_scale: float = None, records: List[Dict] = None):
+        self.path = path or CASSETTE_PATH
+        self.time_scale = TIME_SCALE if time_scale is None else time_scale
+        self.stats = {'exact': 0, 'substituted': 0}
+        self._exact: Dict[str, deque] = {}
+        self._by_kind: Dict[str, List[Dict]] = {}
+        self._next: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+        for record in (load(self.path) if records is None else records):
+            self._exact.setdefault(record['prompt_hash'], deque()).append(record)
+            self._by_kind.setdefault(record['kind'], []).append(record)
+
+    def _take(self, kind: str, prompt: str) -> Dict:
+        """Exact recording of this prompt if one is left, else the next one of the same kind"""
+        with self._lock:
+            exact = self._exact.get(prompt_hash(kind, prompt))
+            if exact:
+                self.stats['exact'] += 1
+                # Keep the last recording so repeated prompts still match
+                return exact.popleft() if len(exact) > 1 else exact[0]
+
+            recorded = self._by_kind.get(kind)
+            if not recorded:
+                raise CassetteMissError(f"cassette {self.path} has no '{kind}' calls")
+            self.stats['substituted'] += 1
+            idx = self._next.get(kind, 0)
+            self._next[kind] = idx + 1
+            return recorded[idx % len(recorded)]
+
+    def _sleep(self, ms: float, timeout: float = None):
+        seconds = ms / 1000 * self.time_scale
+        if timeout is not None and seconds > timeout:
+            time.sleep(timeout)
+            raise TimeoutError(f"replayed call exceeded {timeout:.1f}s")
+        if seconds > 0:
+            time.sleep(seconds)
+
+    def generate(self, kind: str, prompt: str, timeout: float) -> str:
+        record = self._take(kind, prompt)
+        self._sleep(record['latency_ms'], timeout)
+        if 'error' in record:
+            raise ReplayedError(record['error']['code'], record['error']['message'])
+        return record['response']
+
+    def stream(self, kind: str, prompt: str, timeout: float) -> Iterator[str]:
+        record = self._take(kind, prompt)
+        chunks = record.get('chunks')
+        if chunks is None:
+            # Recorded through generate(): replay it as a single chunk
+            chunks = [] if 'error' in record else [{'text': record['response'], 'offset_ms': record['latency_ms']}]
+
+        elapsed = 0.0
+        for n, chunk in enumerate(chunks):
+            # Only the wait for the first chunk counts against the deadline
+            self._sleep(chunk['offset_ms'] - elapsed, timeout if n == 0 else None)
+            elapsed = chunk['offset_ms']
+            yield chunk['text']
+        if 'error' in record:
+            self._sleep(record['latency_ms'] - elapsed, None if chunks else timeout)
+            raise ReplayedError(record['error']['code'], record['error']['message'])
+
+def backend_from_env(mode: str) -> Backend:
+    """RecordingBackend around Gemini for 'record', ReplayBackend for 'replay'"""
+    if mode == "record":
+        return RecordingBackend(GeminiBackend())
+    return ReplayBackend()
@@ -0,0 +1,244 @@
+# utils/llm_fake.py - Offline, deterministic stand-in for the Gemini backend
+#
+# FakeBackend answers every prompt kind used by GapMentorAI with a response
+# that passes the schemas in utils/llm_parsing.py, so test generation,
+# grading, gap analysis, study plans and chat can be load-tested without
+# network access. Response content is a pure function of (seed, kind,
+# prompt); latency and injected failures come from a seeded sequence, so a
+# run is reproducible for a given call order.
+#
+# Enable with GAPMENTOR_LLM_BACKEND=fake and tune with:
+#   GAPMENTOR_FAKE_LLM_SEED          seed for content, latency and failures (default 7)
+#   GAPMENTOR_FAKE_LLM_LATENCY_MS    median latency of a call (default 800)
+#   GAPMENTOR_FAKE_LLM_LATENCY       'lognormal' (default), 'uniform' or 'fixed'
+#   GAPMENTOR_FAKE_LLM_FAILURE_RATE  share of calls failing with 429/503 (default 0)
+
+import hashlib
+import json
+import os
+import random
+import re
+import threading
+import time
+from typing import Dict, Iterator
+
+from utils.llm import Backend
+
+# Relative cost of each call kind (generation and plans write the most tokens)
+KIND_LATENCY_FACTOR = {
+    'generate': 2.0,
+    'evaluate': 0.5,
+    'analyze': 1.0,
+    'plan': 2.0,
+    'chat': 1.0,
+    'summarize': 0.5,
+}
+
+# Share of a streamed call's latency spent before the first chunk
+STREAM_FIRST_CHUNK_SHARE = 0.2
+
+_CONCEPTS = [
+    "recursion", "iteration", "memory", "scope", "closure", "inheritance", "interface", "protocol",
+    "index", "cache", "latency", "throughput", "gradient", "vector", "matrix", "entropy", "energy",
+    "momentum", "velocity", "pressure", "catalyst", "enzyme", "membrane", "genome", "mutation",
+    "treaty", "empire", "revolution", "economy", "migration", "equation", "integral", "derivative",
+    "polynomial", "probability", "variance", "hypothesis", "experiment", "model", "theory",
+    "algorithm", "structure", "pattern", "boundary", "constraint", "invariant", "transaction",
+    "concurrency", "serialization", "encoding", "compiler", "runtime", "exception", "module",
+]
+_ASPECTS = [
+    "limitations", "trade-offs", "assumptions", "edge cases", "real-world uses", "failure modes",
+    "historical origins", "performance", "common misconceptions", "key properties",
+]
+
+class FakeProviderError(Exception):
+    """Injected provider failure; carries an HTTP-like status code"""
+
+    def __init__(self, code: int, message: str):
+        super().__init__(message)
+        self.code = code
+
+class FakeBackend(Backend):
+    """Seedable offline backend with configurable latency and failure rate"""
+
+    name = "fake"
+
+    def __init__(self, seed: int = 7, latency_ms: float = 800, latency_distribution: str = "lognormal",
+                 failure_rate: float = 0.0, sleep: bool = True):
+        self.seed = seed
+        self.latency_ms = latency_ms
+        self.latency_distribution = latency_distribution
+        self.failure_rate = failure_rate
+        self.sleep = sleep
+        self.calls: Dict[str, int] = {}
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> "FakeBackend":
+        return cls(
+            seed=int(os.environ.get("GAPMENTOR_FAKE_LLM_SEED", "7")),
+            latency_ms=float(os.environ.get("GAPMENTOR_FAKE_LLM_LATENCY_MS", "800")),
+            latency_distribution=os.environ.get("GAPMENTOR_FAKE_LLM_LATENCY", "lognormal"),
+            failure_rate=float(os.environ.get("GAPMENTOR_FAKE_LLM_FAILURE_RATE", "0")),
+        )
+
+    # Latency and failures
+
+    def _draw(self, kind: str):
+        """Latency (seconds) and whether this call fails, from the seeded sequence"""
+        with self._lock:
+            self.calls[kind] = self.calls.get(kind, 0) + 1
+            median = self.latency_ms / 1000 * KIND_LATENCY_FACTOR.get(kind, 1.0)
+            if self.latency_distribution == "fixed":
+                latency = median
+            elif self.latency_distribution == "uniform":
+                latency = self._rng.uniform(0.5 * median, 1.5 * median)
+            else:
+                latency = median * self._rng.lognormvariate(0, 0.5)
+            failed = self._rng.random() < self.failure_rate
+            code = self._rng.choice((429, 503))
+        return latency, failed, code
+
+    def _wait(self, seconds: float, timeout: float):
+        if seconds > timeout:
+            if self.sleep:
+                time.sleep(timeout)
+            raise TimeoutError(f"fake backend call exceeded {timeout:.1f}s")
+        if self.sleep:
+            time.sleep(seconds)
+
+    def generate(self, kind: str, prompt: str, timeout: float) -> str:
+        latency, failed, code = self._draw(kind)
+        if failed:
+            # Failures surface quickly, like a rejected request
+            self._wait(latency * 0.1, timeout)
+            raise FakeProviderError(code, f"fake backend injected HTTP {code}")
+        self._wait(latency, timeout)
+        return self.respond(kind, prompt)
+
+    def stream(self, kind: str, prompt: str, timeout: float) -> Iterator[str]:
+        latency, failed, code = self._draw(kind)
+        self._wait(latency * STREAM_FIRST_CHUNK_SHARE, timeout)
+        if failed:
+            raise FakeProviderError(code, f"fake backend injected HTTP {code}")
+
+        words = self.respond(kind, prompt).split(" ")
+        chunks = [" ".join(words[i:i + 4]) + " " for i in range(0, len(words), 4)]
+        per_chunk = latency * (1 - STREAM_FIRST_CHUNK_SHARE) / max(1, len(chunks))
+        for n, chunk in enumerate(chunks):
+            if n and self.sleep:
+                time.sleep(per_chunk)
+            yield chunk
+
+    # Responses
+
+    def respond(self, kind: str, prompt: str) -> str:
+        """Deterministic, schema-valid response text for a prompt"""
+        digest = hashlib.sha256(f"{self.seed}:{kind}:{prompt}".encode('utf-8')).hexdigest()
+        rng = random.Random(digest)
+        handler = {
+            'generate': self._questions,
+            'evaluate': self._evaluation,
+            'analyze': self._gaps,
+            'plan': self._plan,
+            'summarize': self._summary,
+        }.get(kind, self._chat)
+        return handler(prompt, rng)
+
+    def _questions(self, prompt: str, rng: random.Random) -> str:
+        mcq = _int(r"MCQ \(Multiple Choice\): (\d+)", prompt, 5)
+        descriptive = _int(r"Descriptive \(Short Answer\): (\d+)", prompt, 0)
+        topic = _text(r'for the topic: "(.+?)"', prompt, "the topic")
+
+        questions = []
+        for n in range(mcq + descriptive):
+            a, b = rng.sample(_CONCEPTS, 2)
+            aspect = rng.choice(_ASPECTS)
+            tag = rng.randrange(10 ** 6)
+            if n < mcq:
+                options = [f"{rng.choice(_CONCEPTS).title()} {rng.choice(_ASPECTS)} ({i})" for i in range(4)]
+                questions.append({
+                    "question": f"In {topic}, which statement about {a} and {b} {aspect} holds (case {tag})?",
+                    "type": "MCQ",
+                    "options": options,
+                    "correct_answer": options[rng.randrange(4)],
+                })
+            else:
+                questions.append({
+                    "question": f"Explain the {aspect} of {a} relative to {b} in {topic} (case {tag}).",
+                    "type": "Descriptive",
+                    "options": None,
+                    "correct_answer": f"{a.title()} and {b} differ in {aspect}; key points cover {topic} basics.",
+                })
+        return json.dumps(questions)
+
+    def _evaluation(self, prompt: str, rng: random.Random) -> str:
+        items = [int(i) for i in re.findall(r"^Item (\d+):", prompt, re.MULTILINE)]
+
+        def grade(extra: Dict) -> Dict:
+            score = rng.randint(20, 100)
+            return dict(extra, score=score, is_correct=score >= 60,
+                        feedback="Covers the main idea." if score >= 60 else "Missing key points.")
+
+        if items:
+            return json.dumps([grade({"item": i}) for i in items])
+        return json.dumps(grade({}))
+
+    def _gaps(self, prompt: str, rng: random.Random) -> str:
+        topic = _text(r'test on "(.+?)"', prompt, "the topic")
+        return json.dumps([{
+            "subtopic": f"{concept.title()} in {topic}",
+            "priority": rng.choice(("high", "medium", "low")),
+            "description": f"Review how {concept} applies to {topic}.",
+        } for concept in rng.sample(_CONCEPTS, rng.randint(3, 5))])
+
+    def _plan(self, prompt: str, rng: random.Random) -> str:
+        days = _int(r"Create a (\d+)-day", prompt, 7)
+        gaps = re.findall(r"^- (.+?) \(Priority: (\w+)\)", prompt, re.MULTILINE) or [("General review", "medium")]
+
+        tasks = []
+        for day in range(1, days + 1):
+            for _ in range(rng.randint(1, 2)):
+                gap, priority = rng.choice(gaps)
+                tasks.append({
+                    "task_name": f"{rng.choice(('Read about', 'Practice', 'Revise'))} {gap}",
+                    "description": f"Work through {rng.choice(_ASPECTS)} of {gap}.",
+                    "topic": gap.split(":")[0],
+                    "priority": priority,
+                    "estimated_time": rng.choice((30, 45, 60, 90, 120)),
+                    "day": day,
+                    "resources": "Course notes and practice questions",
+                })
+        return json.dumps({
+            "plan_name": f"{days}-Day Learning Gap Plan",
+            "description": f"Covers {len(gaps)} gap(s) over {days} days.",
+            "tasks": tasks,
+        })
+
+    def _summary(self, prompt: str, rng: random.Random) -> str:
+        concepts = ", ".join(rng.sample(_CONCEPTS, 3))
+        return f"The student has been discussing {concepts}. They asked for explanations and examples."
+
+    def _chat(self, prompt: str, rng: random.Random) -> str:
+        sentences = [
+            f"Let's look at {rng.choice(_CONCEPTS)} from the angle of its {rng.choice(_ASPECTS)}."
+            for _ in range(rng.randint(4, 9))
+        ]
+        return " ".join(sentences) + " Does that help?"
+
+def _int(pattern: str, text: str, default: int) -> int:
+    match = re.search(pattern, text)
+    return int(match.group(1)) if match else default
+
+def _text(pattern: str, text: str, default: str) -> str:
+    match = re.search(pattern, text)
+    return match.group(1) if match else default
+
+def use_fake_backend(**kwargs) -> FakeBackend:
+    """Install a FakeBackend for this process and return it"""
+    from utils import llm
+
+    backend = FakeBackend(**kwargs)
+    llm.set_backend(backend)
+    return backend
@@ -0,0 +1,262 @@
+# utils/llm_parsing.py - Tolerant JSON extraction for LLM responses
+#
+# Model output is often almost-JSON: wrapped in code fences, with trailing
+# commas in objects or arrays, or cut off in the middle of the last object. Instead of discarding
+# the whole response, arrays are decoded one element at a time so every valid
+# object is kept, and each object is checked against the schema for its call.
+# Parsers return what they could salvage plus a list of what was dropped, so
+# callers can re-request only the missing items.
+
+import json
+import math
+import re
+from typing import Dict, List, Optional, Tuple
+
+# Schema: field -> (accepted type(s), required). int fields also accept
+# numeric strings and floats; str fields must be non-empty when required.
+QUESTION_SCHEMA = {
+    'question': (str, True),
+    'type': (str, True),
+    'options': ((list, type(None)), False),
+    'correct_answer': (str, True),
+}
+
+EVALUATION_SCHEMA = {
+    'score': (int, True),
+    'is_correct': (bool, False),
+    'feedback': (str, False),
+}
+
+BATCH_EVALUATION_SCHEMA = dict(EVALUATION_SCHEMA, item=(int, True))
+
+GAP_SCHEMA = {
+    'subtopic': (str, True),
+    'priority': (str, True),
+    'description': (str, False),
+}
+
+PLAN_TASK_SCHEMA = {
+    'task_name': (str, True),
+    'description': (str, False),
+    'topic': (str, False),
+    'priority': (str, False),
+    'estimated_time': (int, False),
+    'day': (int, True),
+    'resources': (str, False),
+}
+
+PLAN_SCHEMA = {
+    'plan_name': (str, True),
+    'description': (str, False),
+    'tasks': (list, True),
+}
+
+_decoder = json.JSONDecoder()
+
+# Placeholder for an undecodable array element, so later elements keep their index
+_MALFORMED = object()
+_WHITESPACE = re.compile(r'\s*')
+
+def strip_fences(text: str) -> str:
+    """Remove markdown code fences around a response"""
+    text = (text or "").strip()
+    if text.startswith("```json"):
+        text = text[7:]
+    if text.startswith("```"):
+        text = text[3:]
+    if text.endswith("```"):
+        text = text[:-3]
+    return text.strip()
+
+def validate(item, schema: Dict) -> Tuple[Optional[Dict], Optional[str]]:
+    """Check one object against a schema; returns (cleaned object, None) or (None, reason)"""
+    if not isinstance(item, dict):
+        return None, f"expected an object, got {type(item).__name__}"
+
+    cleaned = dict(item)
+    for field, (expected, required) in schema.items():
+        value = item.get(field)
+        if value is None or value == "":
+            if required:
+                return None, f"missing '{field}'"
+            continue
+
+        if expected is int and not isinstance(value, bool):
+            try:
+                number = float(value)
+            except (TypeError, ValueError):
+                return None, f"'{field}' is not a number"
+            # json accepts Infinity and NaN, which int() cannot convert
+            if not math.isfinite(number):
+                return None, f"'{field}' is not a finite number"
+            value = int(number)
+        elif expected is bool and isinstance(value, str):
+            if value.strip().lower() not in ('true', 'false'):
+                return None, f"'{field}' is not a boolean"
+            value = value.strip().lower() == 'true'
+        elif not isinstance(value, expected):
+            return None, f"'{field}' has the wrong type"
+        cleaned[field] = value
+
+    return cleaned, None
+
+def parse_array(text: str, schema: Dict) -> Tuple[List[Dict], List[str]]:
+    """Salvage the valid objects of a JSON array response.
+
+    Returns (items, dropped), where dropped describes every element that was
+    malformed, failed the schema, or was lost to truncation.
+    """
+    text = strip_fences(text)
+    start = text.find('[')
+    if start == -1:
+        return [], ["no JSON array in response"]
+
+    raw_items, dropped, _ = _scan_array(text, start)
+    return _validate_items(raw_items, schema, dropped)
+
+def parse_object(text: str, schema: Dict, items_key: str = None,
+                 item_schema: Dict = None) -> Tuple[Optional[Dict], List[str]]:
+    """Salvage a JSON object response.
+
+    With items_key, the array under that key is salvaged element by element
+    and validated against item_schema. Returns (object or None, dropped).
+    """
+    text = strip_fences(text)
+    start = text.find('{')
+    if start == -1:
+        return None, ["no JSON object in response"]
+
+    obj, dropped, _ = _scan_object(text, start, items_key)
+    if items_key and isinstance(obj.get(items_key), list) and item_schema:
+        obj[items_key], dropped = _validate_items(obj[items_key], item_schema, dropped, f"{items_key}: ")
+
+    cleaned, reason = validate(obj, schema)
+    if cleaned is None:
+        return None, dropped + [reason]
+    return cleaned, dropped
+
+def _validate_items(raw_items: List, schema: Dict, dropped: List[str],
+                    prefix: str = "") -> Tuple[List[Dict], List[str]]:
+    items = []
+    for idx, raw in enumerate(raw_items):
+        if raw is _MALFORMED:
+            continue
+        cleaned, reason = validate(raw, schema)
+        if cleaned is None:
+            dropped.append(f"{prefix}item {idx}: {reason}")
+        else:
+            items.append(cleaned)
+    return items, dropped
+
+def _skip(text: str, pos: int) -> int:
+    return _WHITESPACE.match(text, pos).end()
+
+def _scan_array(text: str, pos: int) -> Tuple[List, List[str], int]:
+    """Decode a JSON array starting at text[pos] == '[' element by element"""
+    items, dropped = [], []
+    pos += 1
+    while True:
+        pos = _skip(text, pos)
+        if pos >= len(text):
+            break
+        char = text[pos]
+        if char == ']':
+            return items, dropped, pos + 1
+        if char == ',':
+            pos += 1
+            continue
+
+        try:
+            if char == '{':
+                value, end = _decode_object(text, pos)
+            else:
+                value, end = _decoder.raw_decode(text, pos)
+            items.append(value)
+            pos = end
+        except ValueError:
+            # Resynchronize on the next element that starts a new object
+            match = re.compile(r',\s*\{').search(text, pos + 1)
+            if not match:
+                dropped.append(f"item {len(items)}: truncated")
+                break
+            dropped.append(f"item {len(items)}: malformed JSON")
+            items.append(_MALFORMED)
+            pos = match.end() - 1
+
+    return items, dropped, len(text)
+
+def _scan_object(text: str, pos: int, items_key: str = None) -> Tuple[Dict, List[str], int]:
+    """Decode a JSON object starting at text[pos] == '{' member by member.
+
+    Array members are salvaged with _scan_array; the object is cut at the
+    first member that cannot be decoded. The items_key array keeps its
+    placeholders so dropped elements are reported at their original index.
+    """
+    obj, dropped = {}, []
+    pos += 1
+    while True:
+        pos = _skip(text, pos)
+        if pos >= len(text):
+            break
+        char = text[pos]
+        if char == '}':
+            return obj, dropped, pos + 1
+        if char == ',':
+            pos += 1
+            continue
+
+        try:
+            key, pos = _decoder.raw_decode(text, pos)
+            pos = _skip(text, pos)
+            if not isinstance(key, str) or text[pos:pos + 1] != ':':
+                raise ValueError("expected a key")
+            pos = _skip(text, pos + 1)
+            if text[pos:pos + 1] == '[':
+                value, item_dropped, pos = _scan_array(text, pos)
+                dropped.extend(f"{key}: {reason}" for reason in item_dropped)
+                if key != items_key:
+                    value = [v for v in value if v is not _MALFORMED]
+            else:
+                value, pos = _decoder.raw_decode(text, pos)
+            obj[key] = value
+        except ValueError:
+            dropped.append(f"object truncated after {len(obj)} fields")
+            break
+
+    return obj, dropped, len(text)
+
+def _decode_object(text: str, pos: int) -> Tuple[Dict, int]:
+    """Decode one object strictly, retrying once without trailing commas"""
+    try:
+        return _decoder.raw_decode(text, pos)
+    except ValueError:
+        fixed, end = _without_trailing_commas(text, pos)
+        return json.loads(fixed), end
+
+def _without_trailing_commas(text: str, pos: int) -> Tuple[str, int]:
+    """The object starting at text[pos] with commas before '}' and ']' removed, and where it ends"""
+    out, depth, in_string, escaped = [], 0, False, False
+    for idx in range(pos, len(text)):
+        char = text[idx]
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == '\\':
+                escaped = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char in '{[':
+            depth += 1
+        elif char in '}]':
+            depth -= 1
+            last = len(out) - 1
+            while last >= 0 and out[last].isspace():
+                last -= 1
+            if last >= 0 and out[last] == ',':
+                del out[last]
+        out.append(char)
+        if depth == 0:
+            return "".join(out), idx + 1
+    raise ValueError("unterminated object")
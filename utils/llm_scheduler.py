@@ -0,0 +1,200 @@
+# utils/llm_scheduler.py - Cross-process LLM rate limiter with a fair priority queue
+#
+# All Streamlit sessions and worker processes share one token bucket stored in
+# SQLite (llm_rate_bucket), refilled at GAPMENTOR_LLM_RATE_PER_MIN with room
+# for GAPMENTOR_LLM_BURST calls at once. Every call attempt first takes a
+# ticket in llm_queue and may only spend a token once fewer tickets than there
+# are tokens are ahead of it. Tickets are ordered by call priority (chat, then
+# grading, generation and gap analysis), then by how many requests the same
+# user already has waiting, so one user's many chunks cannot starve another
+# user's single request. Waiting requests only read the queue; the token is
+# spent in a BEGIN IMMEDIATE transaction once it is due, so separate processes
+# see one queue without every waiter contending for SQLite's write lock.
+# While a request waits, the session's on_wait callback receives the
+# estimated wait for the UI.
+#
+# Set GAPMENTOR_LLM_SCHEDULER=0 to disable (calls go straight to the backend).
+
+import contextvars
+import math
+import os
+import threading
+import time
+from typing import Callable, Optional, Tuple
+
+ENABLED = os.environ.get("GAPMENTOR_LLM_SCHEDULER", "1") != "0"
+
+# Provider quota shared by every process using this database
+RATE_PER_MIN = float(os.environ.get("GAPMENTOR_LLM_RATE_PER_MIN", "60"))
+BURST = float(os.environ.get("GAPMENTOR_LLM_BURST", "10"))
+
+# Longest a request waits in the queue before giving up (seconds)
+MAX_QUEUE_WAIT = float(os.environ.get("GAPMENTOR_LLM_MAX_QUEUE_WAIT", "120"))
+
+# Lower runs first; kinds not listed run last
+PRIORITIES = {
+    'chat': 0,
+    'evaluate': 1,
+    'generate': 2,
+    'analyze': 3,
+    'plan': 3,
+    'summarize': 4,
+}
+
+# Poll interval bounds while waiting, and how long a ticket outlives its last poll
+POLL_MIN = 0.05
+POLL_MAX = 1.0
+TICKET_TTL = 10.0
+
+# Queue key for calls made outside a user's session (background refills, summaries)
+SYSTEM_USER = "system"
+
+OnWait = Callable[[float, int], None]
+
+_user: contextvars.ContextVar = contextvars.ContextVar("gapmentor_llm_user", default=None)
+_on_wait: contextvars.ContextVar = contextvars.ContextVar("gapmentor_llm_on_wait", default=None)
+
+class QueueTimeoutError(Exception):
+    """A request waited longer than MAX_QUEUE_WAIT for its turn"""
+
+def set_request_context(user_id: Optional[int], on_wait: OnWait = None):
+    """Queue this session's calls under user_id and report waits to on_wait(seconds, ahead).
+
+    on_wait(0, 0) is called once the request gets its turn after waiting.
+    Call at the top of a page; worker threads inherit it via contextvars.copy_context().
+    """
+    _user.set(SYSTEM_USER if user_id is None else str(user_id))
+    _on_wait.set(on_wait)
+
+def _begin(conn):
+    if conn.in_transaction:
+        conn.commit()
+    conn.execute("BEGIN IMMEDIATE")
+
+def _enqueue(kind: str, user_key: str) -> Tuple[int, int, int]:
+    """Add a ticket; returns (ticket id, priority, user_seq)"""
+    from utils.database import get_connection
+
+    priority = PRIORITIES.get(kind, len(PRIORITIES))
+    with get_connection() as conn:
+        _begin(conn)
+        user_seq = conn.execute("SELECT COUNT(*) FROM llm_queue WHERE user_key = ?", (user_key,)).fetchone()[0]
+        cursor = conn.execute("""
+            INSERT INTO llm_queue (priority, user_key, user_seq, kind, enqueued_at, expires_at)
+            VALUES (?, ?, ?, ?, ?, ?)
+        """, (priority, user_key, user_seq, kind, time.time(), time.time() + TICKET_TTL))
+        return cursor.lastrowid, priority, user_seq
+
+def _peek(ticket: Tuple[int, int, int], now: float) -> Tuple[float, int]:
+    """Tokens in the bucket and live tickets ahead of this one, read without a write lock"""
+    from utils.database import get_connection
+
+    ticket_id, priority, user_seq = ticket
+    with get_connection() as conn:
+        tokens, updated_at = conn.execute("SELECT tokens, updated_at FROM llm_rate_bucket WHERE id = 1").fetchone()
+        ahead = conn.execute("""
+            SELECT COUNT(*) FROM llm_queue
+            WHERE (priority, user_seq, id) < (?, ?, ?) AND expires_at >= ?
+        """, (priority, user_seq, ticket_id, now)).fetchone()[0]
+    return min(BURST, tokens + max(0.0, now - updated_at) * RATE_PER_MIN / 60), ahead
+
+def _heartbeat(ticket_id: int, now: float):
+    """Keep a waiting ticket alive; tickets of crashed requests expire after TICKET_TTL"""
+    from utils.database import get_connection
+
+    with get_connection() as conn:
+        conn.execute("UPDATE llm_queue SET expires_at = ? WHERE id = ?", (now + TICKET_TTL, ticket_id))
+
+def _try_acquire(ticket: Tuple[int, int, int], now: float) -> bool:
+    """Spend a token for this ticket if its turn is still due once the write lock is held"""
+    from utils.database import get_connection
+
+    ticket_id, priority, user_seq = ticket
+    with get_connection() as conn:
+        _begin(conn)
+        # Tickets of crashed or abandoned requests stop blocking the queue
+        conn.execute("DELETE FROM llm_queue WHERE expires_at < ?", (now,))
+        tokens, updated_at = conn.execute("SELECT tokens, updated_at FROM llm_rate_bucket WHERE id = 1").fetchone()
+        tokens = min(BURST, tokens + max(0.0, now - updated_at) * RATE_PER_MIN / 60)
+        ahead = conn.execute("""
+            SELECT COUNT(*) FROM llm_queue
+            WHERE (priority, user_seq, id) < (?, ?, ?)
+        """, (priority, user_seq, ticket_id)).fetchone()[0]
+        if tokens < ahead + 1:
+            return False
+        conn.execute("DELETE FROM llm_queue WHERE id = ?", (ticket_id,))
+        conn.execute("UPDATE llm_rate_bucket SET tokens = ?, updated_at = ? WHERE id = 1", (tokens - 1, now))
+        return True
+
+def acquire(kind: str) -> float:
+    """Block until this call may go to the provider; returns the seconds spent waiting"""
+    if not ENABLED:
+        return 0.0
+    from utils.database import get_connection
+
+    on_wait = _on_wait.get()
+    started = time.monotonic()
+    ticket = _enqueue(kind, _user.get() or SYSTEM_USER)
+    granted = waited = False
+    heartbeat_at = time.time()
+    rate = RATE_PER_MIN / 60
+    try:
+        while True:
+            # Waiters only read the queue; the write lock is taken once a token is due
+            now = time.time()
+            tokens, ahead = _peek(ticket, now)
+            if tokens >= ahead + 1:
+                granted = _try_acquire(ticket, now)
+                if granted:
+                    if waited and on_wait:
+                        on_wait(0.0, 0)
+                    return time.monotonic() - started
+            elif now - heartbeat_at > TICKET_TTL / 2:
+                _heartbeat(ticket[0], now)
+                heartbeat_at = now
+
+            wait = max(0.0, (ahead + 1 - tokens) / rate) if rate > 0 else math.inf
+            elapsed = time.monotonic() - started
+            if elapsed + min(wait, POLL_MAX) > MAX_QUEUE_WAIT:
+                raise QueueTimeoutError(f"waited {elapsed:.0f}s for a {kind} slot ({ahead} request(s) ahead)")
+            if on_wait:
+                on_wait(wait, ahead)
+            waited = True
+            time.sleep(max(POLL_MIN, min(wait, POLL_MAX)))
+    finally:
+        if not granted:
+            with get_connection() as conn:
+                conn.execute("DELETE FROM llm_queue WHERE id = ?", (ticket[0],))
+
+def throttle():
+    """Empty the shared bucket after a provider 429, so every process backs off"""
+    if not ENABLED:
+        return
+    from utils.database import get_connection
+
+    with get_connection() as conn:
+        conn.execute("UPDATE llm_rate_bucket SET tokens = 0, updated_at = ? WHERE id = 1", (time.time(),))
+
+def wait_notice(placeholder) -> OnWait:
+    """on_wait callback that shows the estimated wait in a Streamlit placeholder.
+
+    Waits can happen in worker threads (parallel generation and grading), so
+    the page's script context is attached to whichever thread reports them.
+    """
+    try:
+        from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+        ctx = get_script_run_ctx()
+    except ImportError:
+        add_script_run_ctx, ctx = None, None
+    lock = threading.Lock()
+
+    def show(seconds: float, ahead: int):
+        if ctx is not None:
+            add_script_run_ctx(threading.current_thread(), ctx)
+        with lock:
+            if seconds <= 0:
+                placeholder.empty()
+            else:
+                placeholder.info(f"⏳ Lots of students are using the AI right now. Your request starts in about "
+                                 f"{math.ceil(seconds)}s ({ahead} ahead of you).")
+    return show
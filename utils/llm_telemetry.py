@@ -0,0 +1,163 @@
+# utils/llm_telemetry.py - Per-call instrumentation of LLM traffic
+#
+# utils/llm.py opens a CallRecord for every call and finishes it when the
+# response (or the last streamed chunk, or the error) arrives. Each record
+# becomes one row in llm_calls, written through the write-behind queue:
+# wall time, time to first byte, prompt/response size, attempts, outcome,
+# whether the caller fell back to a non-LLM answer, and the cache outcome of
+# the request that triggered it. Question-cache lookups get rows of their
+# own, so hit rates sit next to the calls they saved.
+#
+# Set GAPMENTOR_LLM_TELEMETRY=0 to stop recording.
+
+import contextvars
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+from utils import write_behind
+from utils.text import estimate_tokens
+
+ENABLED = os.environ.get("GAPMENTOR_LLM_TELEMETRY", "1") != "0"
+
+# Call site reported for each llm call kind
+CALL_SITES = {
+    'generate': 'generate_test',
+    'evaluate': 'evaluate_descriptive',
+    'analyze': 'analyze_gaps',
+    'plan': 'study_plan',
+    'chat': 'chat',
+    'summarize': 'chat_summary',
+}
+
+# Cache outcome of the request the current calls serve ('miss' or 'stale')
+_cache_outcome: contextvars.ContextVar = contextvars.ContextVar("gapmentor_llm_cache", default=None)
+
+# Last finished call per thread, so a caller's fallback can be attached to it
+_local = threading.local()
+
+@contextmanager
+def cache_outcome(outcome: str):
+    """Tag the LLM calls made inside the block with a cache outcome"""
+    token = _cache_outcome.set(outcome)
+    try:
+        yield
+    finally:
+        _cache_outcome.reset(token)
+
+class CallRecord:
+    """Timing and size of one LLM call, across all its retry attempts"""
+
+    def __init__(self, kind: str, prompt: str, backend: str):
+        self.call_id = uuid.uuid4().hex
+        self.call_site = CALL_SITES.get(kind, kind)
+        self.backend = backend
+        self.prompt = prompt
+        self.cache = _cache_outcome.get()
+        self.attempts = 0
+        self.ttfb_ms: Optional[float] = None
+        self.started = time.perf_counter()
+        self.finished = False
+
+    def _elapsed_ms(self) -> float:
+        return (time.perf_counter() - self.started) * 1000
+
+    def first_byte(self):
+        if self.ttfb_ms is None:
+            self.ttfb_ms = self._elapsed_ms()
+
+    def finish(self, response: str = "", error: Exception = None):
+        """Write the record; later calls are ignored"""
+        if self.finished:
+            return
+        self.finished = True
+        if error is None:
+            outcome = 'ok'
+            self.first_byte()
+        elif type(error).__name__ == 'LLMUnavailableError':
+            outcome = 'unavailable'
+        else:
+            outcome = 'error'
+
+        _local.last = (self.call_site, self.call_id)
+        _write(self.call_id, self.call_site, self.backend, outcome, self._elapsed_ms(), self.ttfb_ms,
+               self.prompt, response, self.attempts, self.cache)
+
+def _write(call_id: str, call_site: str, backend: Optional[str], outcome: str, wall_ms: Optional[float],
+           ttfb_ms: Optional[float], prompt: str = "", response: str = "", attempts: int = 0,
+           cache: str = None, fallback: bool = False):
+    if not ENABLED:
+        return
+
+    response = response or ""
+    # The shared estimate counts an empty text as one token; an empty call has none
+    prompt_tokens = estimate_tokens(prompt) if prompt else 0
+    response_tokens = estimate_tokens(response) if response else 0
+    write_behind.submit([("""
+        INSERT INTO llm_calls (call_id, call_site, backend, outcome, wall_ms, ttfb_ms, prompt_chars, prompt_tokens,
+                               response_chars, response_tokens, attempts, fallback, cache)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """, (call_id, call_site, backend, outcome, wall_ms, ttfb_ms, len(prompt), prompt_tokens,
+          len(response), response_tokens, attempts, int(fallback), cache))])
+
+def mark_fallback(call_site: str, abandoned: bool = False):
+    """Record that a caller answered without the model (keyword scoring, default gaps, ...).
+
+    Attaches to this thread's last call when it was for the same site. With
+    abandoned (the caller gave up waiting on a call still running in another
+    thread), or when there is no such call, a separate 'abandoned' row is written.
+    """
+    last = getattr(_local, 'last', None)
+    _local.last = None
+    if last and last[0] == call_site and not abandoned:
+        if ENABLED:
+            write_behind.submit([("UPDATE llm_calls SET fallback = 1 WHERE call_id = ?", (last[1],))])
+    else:
+        _write(uuid.uuid4().hex, call_site, None, 'abandoned', None, None, fallback=True)
+
+def record_cache_lookup(call_site: str, outcome: str, wall_ms: float):
+    """A cache lookup ('hit', 'miss' or 'stale'); a hit answers the request with no LLM call"""
+    _write(uuid.uuid4().hex, call_site, None, 'cache_lookup', wall_ms, None, cache=outcome)
+
+def get_report(days: int = 7) -> Dict[str, Dict]:
+    """p50/p95/p99 wall time and time to first byte, sizes, retries, fallbacks and cache hits per call site"""
+    from utils.database import get_connection, flush_writes, percentile
+
+    flush_writes()
+    conn = get_connection()
+    report = {}
+    for call_site in CALL_SITES.values():
+        rows = conn.execute("""
+            SELECT outcome, wall_ms, ttfb_ms, prompt_tokens, response_tokens, attempts, fallback, cache
+            FROM llm_calls
+            WHERE call_site = ? AND created_at >= datetime('now', ?)
+        """, (call_site, f"-{int(days)} days")).fetchall()
+        if not rows:
+            continue
+
+        calls = [row for row in rows if row['outcome'] in ('ok', 'error', 'unavailable')]
+        wall = [row['wall_ms'] for row in calls]
+        ttfb = [row['ttfb_ms'] for row in calls]
+        lookups = [row for row in rows if row['outcome'] == 'cache_lookup']
+        hits = sum(1 for row in lookups if row['cache'] == 'hit')
+        report[call_site] = {
+            'calls': len(calls),
+            'errors': sum(1 for row in calls if row['outcome'] != 'ok'),
+            'retries': sum(max(0, (row['attempts'] or 0) - 1) for row in calls),
+            'fallbacks': sum(row['fallback'] or 0 for row in rows),
+            'wall_p50_ms': percentile(wall, 50),
+            'wall_p95_ms': percentile(wall, 95),
+            'wall_p99_ms': percentile(wall, 99),
+            'ttfb_p50_ms': percentile(ttfb, 50),
+            'ttfb_p95_ms': percentile(ttfb, 95),
+            'ttfb_p99_ms': percentile(ttfb, 99),
+            'avg_prompt_tokens': round(sum(row['prompt_tokens'] for row in calls) / len(calls)) if calls else 0,
+            'avg_response_tokens': round(sum(row['response_tokens'] for row in calls) / len(calls)) if calls else 0,
+            'cache_lookups': len(lookups),
+            'cache_hit_ratio': round(hits / len(lookups), 3) if lookups else None,
+        }
+    conn.close()
+    return report
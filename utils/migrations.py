@@ -0,0 +1,508 @@
+# utils/migrations.py - Versioned schema migrations for GapMentorAI
+#
+# The schema version is stored in SQLite's PRAGMA user_version. Each entry in
+# MIGRATIONS upgrades the schema by one version and runs in its own
+# transaction, so a database is never left half-migrated.
+
+import sqlite3
+from typing import Callable, List, Tuple
+
+def _migration_1_hot_path_indexes(cursor: sqlite3.Cursor):
+    """Composite indexes for the filters used on every page render"""
+    # Stats, recent results and gap analysis: WHERE user_id = ? AND completed = 1 [ORDER BY completed_at]
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_tests_user_completed ON tests (user_id, completed, completed_at)")
+    # Test history: WHERE user_id = ? ORDER BY created_at DESC
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_tests_user_created ON tests (user_id, created_at)")
+    # Duplicate-question check: WHERE t.user_id = ? AND t.topic_normalized = ?
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_tests_user_topic ON tests (user_id, topic_normalized)")
+    # Answer write-back and incorrect-question lookup: WHERE test_id = ? AND question_number = ?
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_questions_test_number ON questions (test_id, question_number)")
+    # Active gaps: WHERE user_id = ? AND resolved = 0
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_gaps_user_resolved ON gaps (user_id, resolved, identified_at)")
+    # Notification badge and list: WHERE user_id = ? AND read = 0 ORDER BY created_at DESC
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_notifications_user_read ON notifications (user_id, read, created_at)")
+    # Chat sidebar: WHERE user_id = ? ORDER BY last_activity DESC
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_chat_sessions_user_activity ON chat_sessions (user_id, last_activity)")
+    # Loading a chat: WHERE session_id = ? ORDER BY timestamp
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_chat_messages_session_time ON chat_messages (session_id, timestamp)")
+    # Study plans: WHERE user_id = ? AND status = 'active' ORDER BY created_at DESC
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_study_plans_user_status ON study_plans (user_id, status, created_at)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_plan_tasks_plan ON plan_tasks (plan_id, due_date)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_achievements_user_type ON achievements (user_id, achievement_type)")
+
+# Recomputes user_stats rows from the base tables. Shared by migration 2 and
+# utils.database.rebuild_user_stats(); "{where}" optionally limits it to one user.
+USER_STATS_REBUILD_SQL = """
+    INSERT OR REPLACE INTO user_stats (user_id, total_tests, scored_tests, score_sum, topics_covered, total_gaps)
+    SELECT
+        u.user_id,
+        (SELECT COUNT(*) FROM tests WHERE user_id = u.user_id AND completed = 1),
+        (SELECT COUNT(score) FROM tests WHERE user_id = u.user_id AND completed = 1),
+        (SELECT COALESCE(SUM(score), 0) FROM tests WHERE user_id = u.user_id AND completed = 1),
+        (SELECT COUNT(DISTINCT topic_normalized) FROM tests WHERE user_id = u.user_id AND completed = 1),
+        (SELECT COUNT(*) FROM gaps WHERE user_id = u.user_id AND resolved = 0)
+    FROM (SELECT user_id FROM tests UNION SELECT user_id FROM gaps) u
+    {where}
+"""
+
+def _migration_2_user_stats(cursor: sqlite3.Cursor):
+    """Materialized per-user statistics kept current by triggers"""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS user_stats (
+            user_id INTEGER PRIMARY KEY,
+            total_tests INTEGER NOT NULL DEFAULT 0,
+            scored_tests INTEGER NOT NULL DEFAULT 0,
+            score_sum REAL NOT NULL DEFAULT 0,
+            topics_covered INTEGER NOT NULL DEFAULT 0,
+            total_gaps INTEGER NOT NULL DEFAULT 0
+        )
+    """)
+    
+    # A completed test adds to the counters; the topic counts once per user.
+    # "Other completed test on this topic" checks exclude the row itself.
+    add_test = """
+        INSERT OR IGNORE INTO user_stats (user_id) VALUES (NEW.user_id);
+        UPDATE user_stats SET
+            total_tests = total_tests + 1,
+            scored_tests = scored_tests + (NEW.score IS NOT NULL),
+            score_sum = score_sum + COALESCE(NEW.score, 0),
+            topics_covered = topics_covered + NOT EXISTS (
+                SELECT 1 FROM tests
+                WHERE user_id = NEW.user_id AND completed = 1
+                AND topic_normalized = NEW.topic_normalized AND id != NEW.id
+            )
+        WHERE user_id = NEW.user_id AND NEW.completed = 1;
+    """
+    remove_test = """
+        UPDATE user_stats SET
+            total_tests = total_tests - 1,
+            scored_tests = scored_tests - (OLD.score IS NOT NULL),
+            score_sum = score_sum - COALESCE(OLD.score, 0),
+            topics_covered = topics_covered - NOT EXISTS (
+                SELECT 1 FROM tests
+                WHERE user_id = OLD.user_id AND completed = 1
+                AND topic_normalized = OLD.topic_normalized AND id != OLD.id
+            )
+        WHERE user_id = OLD.user_id AND OLD.completed = 1;
+    """
+    cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_user_stats_test_insert
+        AFTER INSERT ON tests WHEN NEW.completed = 1
+        BEGIN {add_test} END
+    """)
+    cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_user_stats_test_update
+        AFTER UPDATE OF user_id, topic_normalized, score, completed ON tests
+        WHEN OLD.completed = 1 OR NEW.completed = 1
+        BEGIN {remove_test} {add_test} END
+    """)
+    cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_user_stats_test_delete
+        AFTER DELETE ON tests WHEN OLD.completed = 1
+        BEGIN {remove_test} END
+    """)
+    
+    # Open (unresolved) gaps
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_user_stats_gap_insert
+        AFTER INSERT ON gaps WHEN NEW.resolved = 0
+        BEGIN
+            INSERT OR IGNORE INTO user_stats (user_id) VALUES (NEW.user_id);
+            UPDATE user_stats SET total_gaps = total_gaps + 1 WHERE user_id = NEW.user_id;
+        END
+    """)
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_user_stats_gap_update
+        AFTER UPDATE OF user_id, resolved ON gaps
+        BEGIN
+            UPDATE user_stats SET total_gaps = total_gaps - 1 WHERE user_id = OLD.user_id AND OLD.resolved = 0;
+            INSERT OR IGNORE INTO user_stats (user_id) VALUES (NEW.user_id);
+            UPDATE user_stats SET total_gaps = total_gaps + 1 WHERE user_id = NEW.user_id AND NEW.resolved = 0;
+        END
+    """)
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_user_stats_gap_delete
+        AFTER DELETE ON gaps WHEN OLD.resolved = 0
+        BEGIN
+            UPDATE user_stats SET total_gaps = total_gaps - 1 WHERE user_id = OLD.user_id;
+        END
+    """)
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_user_stats_user_delete
+        AFTER DELETE ON users
+        BEGIN
+            DELETE FROM user_stats WHERE user_id = OLD.id;
+        END
+    """)
+    
+    # Backfill from existing history
+    cursor.execute(USER_STATS_REBUILD_SQL.format(where=""))
+
+def _migration_3_test_history_indexes(cursor: sqlite3.Cursor):
+    """Indexes for keyset-paginated test history"""
+    # Date sorts use idx_tests_user_created (rowid = id is the implicit last column)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_tests_user_score ON tests (user_id, COALESCE(score, -1))")
+
+def _migration_4_question_cache(cursor: sqlite3.Cursor):
+    """Persistent cache of generated question sets (see utils/question_cache.py)"""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS question_cache (
+            cache_key TEXT PRIMARY KEY,
+            topic_normalized TEXT NOT NULL,
+            difficulty TEXT NOT NULL,
+            num_questions INTEGER NOT NULL,
+            include_descriptive INTEGER NOT NULL,
+            questions TEXT NOT NULL,
+            size_bytes INTEGER NOT NULL,
+            generation_ms REAL,
+            created_at REAL NOT NULL,
+            last_used_at REAL NOT NULL,
+            hits INTEGER DEFAULT 0
+        )
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_question_cache_last_used ON question_cache (last_used_at)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_question_cache_created ON question_cache (created_at)")
+    
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS question_cache_stats (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            lookups INTEGER NOT NULL DEFAULT 0,
+            hits INTEGER NOT NULL DEFAULT 0,
+            stale INTEGER NOT NULL DEFAULT 0,
+            saved_ms REAL NOT NULL DEFAULT 0
+        )
+    """)
+    cursor.execute("INSERT OR IGNORE INTO question_cache_stats (id) VALUES (1)")
+
+def _migration_5_question_bank(cursor: sqlite3.Cursor):
+    """Pre-generated questions per topic and difficulty (see utils/question_bank.py)"""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS question_bank (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            topic_normalized TEXT NOT NULL,
+            difficulty TEXT NOT NULL,
+            question_type TEXT NOT NULL,
+            question_key TEXT NOT NULL,
+            question_json TEXT NOT NULL,
+            created_at REAL NOT NULL,
+            served INTEGER NOT NULL DEFAULT 0,
+            UNIQUE (topic_normalized, difficulty, question_key)
+        )
+    """)
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_question_bank_draw
+        ON question_bank (topic_normalized, difficulty, question_type, served)
+    """)
+    # Popular-pair scan: WHERE created_at >= ? GROUP BY topic_normalized, difficulty
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_tests_created ON tests (created_at)")
+
+def _add_column(cursor: sqlite3.Cursor, table: str, column: str, definition: str):
+    """ALTER TABLE ... ADD COLUMN unless the column already exists"""
+    existing = {row[1] for row in cursor.execute(f"PRAGMA table_info({table})").fetchall()}
+    if column not in existing:
+        cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+
+def _migration_6_chat_latency(cursor: sqlite3.Cursor):
+    """Per-turn streaming latency for assistant chat messages"""
+    _add_column(cursor, "chat_messages", "ttft_ms", "REAL")
+    _add_column(cursor, "chat_messages", "total_ms", "REAL")
+    _add_column(cursor, "chat_messages", "partial", "INTEGER DEFAULT 0")
+
+def _migration_7_chat_summaries(cursor: sqlite3.Cursor):
+    """Rolling summary per chat session (see utils/chat_memory.py)"""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS chat_summaries (
+            session_id INTEGER PRIMARY KEY,
+            summary TEXT NOT NULL,
+            summarized_count INTEGER NOT NULL,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (session_id) REFERENCES chat_sessions(id)
+        )
+    """)
+
+def _migration_8_question_hash(cursor: sqlite3.Cursor):
+    """Normalized question hash for set-based duplicate checks"""
+    from utils.database import question_hash
+
+    _add_column(cursor, "questions", "question_hash", "TEXT")
+    rows = cursor.execute("SELECT id, question_text FROM questions WHERE question_hash IS NULL").fetchall()
+    cursor.executemany("UPDATE questions SET question_hash = ? WHERE id = ?",
+                       [(question_hash(text or ""), row_id) for row_id, text in rows])
+    # Seen-question check: WHERE question_hash IN (...) joined to the user's tests on the topic
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_questions_hash ON questions (question_hash, test_id)")
+
+def _migration_9_question_minhash(cursor: sqlite3.Cursor):
+    """MinHash signatures for near-duplicate question detection"""
+    from utils.near_duplicates import signature, to_blob
+
+    _add_column(cursor, "questions", "minhash", "BLOB")
+    rows = cursor.execute("SELECT id, question_text FROM questions WHERE minhash IS NULL").fetchall()
+    cursor.executemany("UPDATE questions SET minhash = ? WHERE id = ?",
+                       [(to_blob(signature(text or "")), row_id) for row_id, text in rows])
+
+def _migration_10_seen_question_filters(cursor: sqlite3.Cursor):
+    """Per-user, per-topic Bloom filters of seen questions (see utils/seen_filter.py)"""
+    from utils import seen_filter
+
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS seen_question_filters (
+            user_id INTEGER NOT NULL,
+            topic_normalized TEXT NOT NULL,
+            capacity INTEGER NOT NULL,
+            bits BLOB NOT NULL,
+            item_count INTEGER NOT NULL,
+            PRIMARY KEY (user_id, topic_normalized),
+            FOREIGN KEY (user_id) REFERENCES users(id)
+        )
+    """)
+    seen_filter.rebuild_all(cursor)
+
+def _migration_11_llm_calls(cursor: sqlite3.Cursor):
+    """One row per LLM call or cache hit (see utils/llm_telemetry.py)"""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS llm_calls (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            call_id TEXT NOT NULL,
+            call_site TEXT NOT NULL,
+            backend TEXT,
+            outcome TEXT NOT NULL,
+            wall_ms REAL,
+            ttfb_ms REAL,
+            prompt_chars INTEGER DEFAULT 0,
+            prompt_tokens INTEGER DEFAULT 0,
+            response_chars INTEGER DEFAULT 0,
+            response_tokens INTEGER DEFAULT 0,
+            attempts INTEGER DEFAULT 0,
+            fallback INTEGER DEFAULT 0,
+            cache TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    # Report: WHERE call_site = ? AND created_at >= ?
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_llm_calls_site ON llm_calls (call_site, created_at)")
+    # Fallback marking: UPDATE ... WHERE call_id = ?
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_llm_calls_call_id ON llm_calls (call_id)")
+
+def _migration_12_llm_scheduler(cursor: sqlite3.Cursor):
+    """Shared token bucket and request queue for LLM calls (see utils/llm_scheduler.py)"""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS llm_rate_bucket (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            tokens REAL NOT NULL,
+            updated_at REAL NOT NULL
+        )
+    """)
+    # updated_at = 0 makes the first refill start from a full bucket
+    cursor.execute("INSERT OR IGNORE INTO llm_rate_bucket (id, tokens, updated_at) VALUES (1, 0, 0)")
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS llm_queue (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            priority INTEGER NOT NULL,
+            user_key TEXT NOT NULL,
+            user_seq INTEGER NOT NULL,
+            kind TEXT,
+            enqueued_at REAL NOT NULL,
+            expires_at REAL NOT NULL
+        )
+    """)
+    # Turn check: WHERE (priority, user_seq, id) < (?, ?, ?)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_llm_queue_order ON llm_queue (priority, user_seq, id)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_llm_queue_user ON llm_queue (user_key)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_llm_queue_expires ON llm_queue (expires_at)")
+
+def _migration_13_topic_aware_minhash(cursor: sqlite3.Cursor):
+    """Recompute MinHash signatures with stemming and the test's topic words left out"""
+    from utils.near_duplicates import signature, to_blob
+
+    rows = cursor.execute("""
+        SELECT q.id, q.question_text, t.topic_normalized
+        FROM questions q
+        JOIN tests t ON q.test_id = t.id
+    """).fetchall()
+    cursor.executemany("UPDATE questions SET minhash = ? WHERE id = ?",
+                       [(to_blob(signature(text or "", topic or "")), row_id) for row_id, text, topic in rows])
+
+def _migration_14_topic_keys(cursor: sqlite3.Cursor):
+    """One topic normaliser for tests, gaps and the question bank, and a per-pair popularity index"""
+    from utils import seen_filter
+    from utils.text import normalize_topic
+
+    changed_users = set()
+    for table in ("tests", "gaps"):
+        rows = cursor.execute(f"SELECT id, user_id, topic, topic_normalized FROM {table}").fetchall()
+        moved = [(row_id, user_id, normalize_topic(topic)) for row_id, user_id, topic, normalized in rows
+                 if normalize_topic(topic) != normalized]
+        cursor.executemany(f"UPDATE {table} SET topic_normalized = ? WHERE id = ?",
+                           [(normalized, row_id) for row_id, _, normalized in moved])
+        if table == "tests":
+            changed_users.update(user_id for _, user_id, _ in moved)
+
+    # Seen-question filters are keyed by topic; rebuild those of users whose keys moved
+    for user_id in changed_users:
+        cursor.execute("DELETE FROM seen_question_filters WHERE user_id = ?", (user_id,))
+        seen_filter.rebuild_all(cursor, user_id)
+
+    # Refill gating: requests for one pair within the popularity window
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_tests_topic_difficulty
+        ON tests (topic_normalized, difficulty, created_at)
+    """)
+
+def _migration_15_bank_question_hash(cursor: sqlite3.Cursor):
+    """Key question bank rows by question_hash, like the seen-filter and exact dedup"""
+    import json
+    from utils.database import question_hash
+
+    rows = cursor.execute("""
+        SELECT id, topic_normalized, difficulty, question_json
+        FROM question_bank
+        ORDER BY served DESC, id
+    """).fetchall()
+    keys, duplicates, rekeyed = set(), [], []
+    for row_id, topic, difficulty, question_json in rows:
+        key = question_hash(json.loads(question_json).get('question') or "")
+        # Rows that only differed in whitespace now share a key; keep the most served
+        if (topic, difficulty, key) in keys:
+            duplicates.append((row_id,))
+        else:
+            keys.add((topic, difficulty, key))
+            rekeyed.append((key, row_id))
+    cursor.executemany("DELETE FROM question_bank WHERE id = ?", duplicates)
+    # Temporary keys first so the swap never trips the unique constraint
+    cursor.execute("UPDATE question_bank SET question_key = '~' || id")
+    cursor.executemany("UPDATE question_bank SET question_key = ? WHERE id = ?", rekeyed)
+
+# (version, description, upgrade function) - append only, never renumber
+MIGRATIONS: List[Tuple[int, str, Callable[[sqlite3.Cursor], None]]] = [
+    (1, "hot-path indexes", _migration_1_hot_path_indexes),
+    (2, "materialized user_stats", _migration_2_user_stats),
+    (3, "test history indexes", _migration_3_test_history_indexes),
+    (4, "question set cache", _migration_4_question_cache),
+    (5, "question bank", _migration_5_question_bank),
+    (6, "chat streaming latency", _migration_6_chat_latency),
+    (7, "chat session summaries", _migration_7_chat_summaries),
+    (8, "question hashes", _migration_8_question_hash),
+    (9, "question minhash signatures", _migration_9_question_minhash),
+    (10, "seen-question Bloom filters", _migration_10_seen_question_filters),
+    (11, "LLM call telemetry", _migration_11_llm_calls),
+    (12, "LLM rate limiter and queue", _migration_12_llm_scheduler),
+    (13, "topic-aware minhash signatures", _migration_13_topic_aware_minhash),
+    (14, "shared topic keys", _migration_14_topic_keys),
+    (15, "question bank keyed by question hash", _migration_15_bank_question_hash),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+def get_schema_version(conn) -> int:
+    """Read the schema version from PRAGMA user_version"""
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+def apply_migrations(conn) -> List[int]:
+    """Apply all pending migrations in order and return the versions applied"""
+    applied = []
+
+    for version, description, upgrade in MIGRATIONS:
+        if get_schema_version(conn) >= version:
+            continue
+
+        if conn.in_transaction:
+            conn.commit()
+        # BEGIN IMMEDIATE takes the write lock up front, so concurrent
+        # processes starting at the same time migrate one after another.
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if get_schema_version(conn) >= version:
+                conn.rollback()
+                continue
+            upgrade(conn.cursor())
+            conn.execute(f"PRAGMA user_version = {int(version)}")
+            conn.commit()
+        except Exception as e:
+            conn.rollback()
+            raise RuntimeError(f"Migration {version} ({description}) failed: {e}") from e
+        applied.append(version)
+
+    return applied
+
+# Queries issued on every page render. Each must be served by an index;
+# find_full_scans() reports any that fall back to scanning a whole table.
+HOT_QUERIES: List[Tuple[str, str, tuple]] = [
+    ("user stats",
+     "SELECT * FROM user_stats WHERE user_id = ?", (1,)),
+    ("user stats trigger: other completed test on topic",
+     "SELECT 1 FROM tests WHERE user_id = ? AND completed = 1 AND topic_normalized = ? AND id != ?", (1, "python", 1)),
+    ("open gaps",
+     "SELECT COUNT(*) FROM gaps WHERE user_id = ? AND resolved = 0", (1,)),
+    ("recent tests",
+     "SELECT * FROM tests WHERE user_id = ? ORDER BY created_at DESC LIMIT 5", (1,)),
+    ("test history page",
+     "SELECT * FROM tests WHERE user_id = ? AND (created_at, id) < (?, ?) ORDER BY created_at DESC, id DESC LIMIT 21",
+     (1, "2026-01-01 00:00:00", 100)),
+    ("test history page by score",
+     "SELECT * FROM tests WHERE user_id = ? AND (COALESCE(score, -1), id) < (?, ?) "
+     "ORDER BY COALESCE(score, -1) DESC, id DESC LIMIT 21", (1, 50.0, 100)),
+    ("recent completed tests",
+     "SELECT topic, difficulty, score, completed_at FROM tests WHERE user_id = ? AND completed = 1 ORDER BY completed_at DESC LIMIT 5", (1,)),
+    ("score trend",
+     "SELECT DATE(completed_at), score, topic, difficulty FROM tests WHERE user_id = ? AND completed = 1 ORDER BY completed_at", (1,)),
+    ("save answer",
+     "UPDATE questions SET user_answer = ?, is_correct = ? WHERE test_id = ? AND question_number = ?", ("A", 1, 1, 1)),
+    ("incorrect questions",
+     "SELECT question_text FROM questions WHERE test_id = ? AND is_correct = 0", (1,)),
+    ("seen question check",
+     "SELECT DISTINCT q.question_hash FROM questions q JOIN tests t ON q.test_id = t.id "
+     "WHERE t.user_id = ? AND t.topic_normalized = ? AND q.question_hash IN (?, ?, ?)",
+     (1, "python", "0123456789abcdef", "fedcba9876543210", "00000000deadbeef")),
+    ("seen-question filter",
+     "SELECT capacity, bits, item_count FROM seen_question_filters WHERE user_id = ? AND topic_normalized = ?",
+     (1, "python")),
+    ("near-duplicate index refresh",
+     "SELECT q.id, q.minhash FROM questions q JOIN tests t ON q.test_id = t.id "
+     "WHERE t.user_id = ? AND t.topic_normalized = ? AND q.id > ? AND q.minhash IS NOT NULL", (1, "python", 0)),
+    ("active gaps",
+     "SELECT topic, subtopic, priority FROM gaps WHERE user_id = ? AND resolved = 0 ORDER BY identified_at DESC", (1,)),
+    ("unread notification count",
+     "SELECT COUNT(*) FROM notifications WHERE user_id = ? AND read = 0", (1,)),
+    ("notification list",
+     "SELECT * FROM notifications WHERE user_id = ? AND read = 0 ORDER BY created_at DESC", (1,)),
+    ("chat sessions",
+     "SELECT id, session_name FROM chat_sessions WHERE user_id = ? ORDER BY last_activity DESC LIMIT 10", (1,)),
+    ("chat messages",
+     "SELECT role, content FROM chat_messages WHERE session_id = ? ORDER BY timestamp", (1,)),
+    ("chat summary",
+     "SELECT summary, summarized_count FROM chat_summaries WHERE session_id = ?", (1,)),
+    ("active study plan",
+     "SELECT * FROM study_plans WHERE user_id = ? AND status = 'active' ORDER BY created_at DESC LIMIT 1", (1,)),
+    ("plan tasks",
+     "SELECT * FROM plan_tasks WHERE plan_id = ? ORDER BY due_date", (1,)),
+    ("question bank: pair popularity",
+     "SELECT COUNT(*) FROM tests WHERE topic_normalized = ? AND difficulty = ? AND created_at >= datetime('now', ?)",
+     ("python", "medium", "-7 days")),
+    ("question bank draw",
+     "SELECT id, question_json FROM question_bank WHERE topic_normalized = ? AND difficulty = ? "
+     "AND question_type = ? ORDER BY served, id LIMIT 40", ("python", "medium", "MCQ")),
+    ("llm call fallback mark",
+     "UPDATE llm_calls SET fallback = 1 WHERE call_id = ?", ("0123456789abcdef",)),
+    ("llm call report",
+     "SELECT outcome, wall_ms, ttfb_ms, prompt_tokens, response_tokens, attempts, fallback, cache "
+     "FROM llm_calls WHERE call_site = ? AND created_at >= datetime('now', ?)", ("evaluate_descriptive", "-7 days")),
+    ("llm queue: tickets ahead",
+     "SELECT COUNT(*) FROM llm_queue WHERE (priority, user_seq, id) < (?, ?, ?)", (2, 0, 100)),
+    ("llm queue: user's waiting requests",
+     "SELECT COUNT(*) FROM llm_queue WHERE user_key = ?", ("1",)),
+    ("llm queue: expired tickets",
+     "DELETE FROM llm_queue WHERE expires_at < ?", (0.0,)),
+    ("achievements",
+     "SELECT COUNT(*) FROM achievements WHERE user_id = ? AND achievement_type = ?", (1, "tests_5")),
+]
+
+def find_full_scans(conn) -> List[Tuple[str, str]]:
+    """Return (query name, plan detail) for every hot query that scans a table"""
+    scans = []
+    for name, sql, params in HOT_QUERIES:
+        for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", params).fetchall():
+            detail = row[3]
+            # "SEARCH ... USING INDEX" is fine; any "SCAN" walks a whole table or index
+            if detail.startswith("SCAN "):
+                scans.append((name, detail))
+    return scans
@@ -0,0 +1,191 @@
+# utils/near_duplicates.py - Near-duplicate question detection with MinHash + LSH
+#
+# Exact hashes miss rephrasings ("What does a Python list comprehension do?"
+# vs "What do list comprehensions do in Python?"). Each question gets a
+# MinHash signature over its word shingles, stored in questions.minhash.
+# Words are reduced to a crude stem so plurals and verb forms match, and the
+# words of the test's topic are left out: every question on "Python" says
+# "Python", so sharing it says nothing about two questions being the same.
+# Signatures are banded into an LSH table per (user, topic), so a lookup only
+# compares against questions that share a band instead of the whole history.
+# Candidates are confirmed when their estimated Jaccard similarity reaches
+# SIMILARITY_THRESHOLD.
+
+import hashlib
+import os
+import random
+import re
+import threading
+from array import array
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from utils.text import normalize_topic
+
+# Estimated Jaccard similarity at which two questions count as the same
+# (tuned against the labelled pairs in tests/test_near_duplicates.py)
+SIMILARITY_THRESHOLD = float(os.environ.get("GAPMENTOR_NEAR_DUP_THRESHOLD", "0.7"))
+
+# Signature length and LSH banding (BANDS * ROWS == NUM_PERM). With 24 bands
+# of 4 rows a pair at 0.7 similarity becomes a candidate ~99.9% of the time,
+# while unrelated questions (~0.1) almost never do.
+NUM_PERM = 96
+BANDS = 24
+ROWS = NUM_PERM // BANDS
+
+# Words too common in questions to say anything about their content
+STOPWORDS = {
+    "a", "an", "the", "of", "in", "on", "to", "for", "and", "or", "is", "are", "was", "be",
+    "what", "which", "how", "why", "when", "who", "where", "does", "do", "did", "it", "its", "this", "that",
+    "with", "by", "as", "at", "from", "can", "you", "your", "following",
+    "explain", "describe", "define", "difference", "between", "purpose", "meaning", "mean", "briefly",
+}
+
+# (user, topic) indexes kept in memory per process
+MAX_CACHED_INDEXES = 256
+
+_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+_rng = random.Random(20240601)
+_PERMUTATIONS = [(_rng.randrange(1, _PRIME), _rng.randrange(0, _PRIME)) for _ in range(NUM_PERM)]
+# Words, with expressions like 2**3 or a[1:] kept as one token so their order counts
+_WORD = re.compile(r"[a-z0-9_]+(?:[^\sa-z0-9_]+[a-z0-9_]+)*")
+
+def stem(word: str) -> str:
+    """Strip plural and verb endings (lists -> list, inserting -> insert, uses/used/use -> us)"""
+    if len(word) <= 3 or not word.isalpha():
+        return word
+    if word.endswith("ies"):
+        return word[:-3] + "y"
+    if word.endswith("es") and word[-3] in "sxzh":
+        word = word[:-2]
+    elif word.endswith("s") and not word.endswith(("ss", "us", "is")):
+        word = word[:-1]
+    for suffix in ("ing", "ed"):
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+            word = word[:-len(suffix)]
+            break
+    if word.endswith("e") and len(word) > 3:
+        word = word[:-1]
+    return word
+
+def _content_words(text: str) -> List[str]:
+    return [stem(w) for w in _WORD.findall(text.lower()) if w not in STOPWORDS]
+
+def shingles(text: str, topic: str = "") -> set:
+    """Content words and unordered pairs of neighbouring words ("list append" == "append list")"""
+    words = _content_words(text)
+    topic_words = set(_content_words(topic))
+    # A question made only of topic words ("What is Python?") keeps them
+    if any(w not in topic_words for w in words):
+        words = [w for w in words if w not in topic_words]
+    return set(words) | {" ".join(sorted(pair)) for pair in zip(words, words[1:])}
+
+def signature(text: str, topic: str = "") -> array:
+    """MinHash signature of a question on a topic (NUM_PERM unsigned 32-bit values)"""
+    hashes = [int.from_bytes(hashlib.blake2b(s.encode('utf-8'), digest_size=8).digest(), 'little')
+              for s in shingles(text, topic)]
+    if not hashes:
+        return array('I', [_MAX_HASH] * NUM_PERM)
+    return array('I', [min(((a * h + b) % _PRIME) & _MAX_HASH for h in hashes) for a, b in _PERMUTATIONS])
+
+def to_blob(sig: array) -> bytes:
+    return sig.tobytes()
+
+def from_blob(blob: bytes) -> array:
+    sig = array('I')
+    sig.frombytes(blob)
+    return sig
+
+def similarity(sig_a: array, sig_b: array) -> float:
+    """Estimated Jaccard similarity of two signatures"""
+    return sum(1 for a, b in zip(sig_a, sig_b) if a == b) / NUM_PERM
+
+class NearDuplicateIndex:
+    """LSH index of MinHash signatures supporting sublinear near-duplicate lookups"""
+
+    def __init__(self, threshold: float = None):
+        self.threshold = SIMILARITY_THRESHOLD if threshold is None else threshold
+        self.signatures: Dict[object, array] = {}
+        self.buckets: List[Dict[bytes, List[object]]] = [{} for _ in range(BANDS)]
+        # Highest questions.id loaded, for incremental refresh from the DB
+        self.watermark = 0
+        self.lock = threading.Lock()
+
+    def _bands(self, sig: array):
+        raw = sig.tobytes()
+        width = ROWS * sig.itemsize
+        for band in range(BANDS):
+            yield band, raw[band * width:(band + 1) * width]
+
+    def add(self, key, sig: array):
+        self.signatures[key] = sig
+        for band, chunk in self._bands(sig):
+            self.buckets[band].setdefault(chunk, []).append(key)
+
+    def match(self, sig: array, threshold: float = None) -> Optional[Tuple[object, float]]:
+        """Most similar indexed key at or above the threshold, or None"""
+        threshold = self.threshold if threshold is None else threshold
+        candidates = set()
+        for band, chunk in self._bands(sig):
+            candidates.update(self.buckets[band].get(chunk, ()))
+
+        best = None
+        for key in candidates:
+            score = similarity(sig, self.signatures[key])
+            if score >= threshold and (best is None or score > best[1]):
+                best = (key, score)
+        return best
+
+    def __len__(self):
+        return len(self.signatures)
+
+_indexes: "OrderedDict[Tuple[str, int, str], NearDuplicateIndex]" = OrderedDict()
+_indexes_lock = threading.Lock()
+
+def _history_index(user_id: int, topic_normalized: str) -> NearDuplicateIndex:
+    """The user's index for a topic; the caller refreshes it under index.lock"""
+    from utils import database
+
+    key = (database.DATABASE_PATH, user_id, topic_normalized)
+    with _indexes_lock:
+        index = _indexes.get(key)
+        if index is None:
+            index = NearDuplicateIndex()
+            _indexes[key] = index
+            while len(_indexes) > MAX_CACHED_INDEXES:
+                _indexes.popitem(last=False)
+        _indexes.move_to_end(key)
+        return index
+
+def _refresh(index: NearDuplicateIndex, user_id: int, topic_normalized: str):
+    """Add questions saved since the index was last used (caller holds index.lock)"""
+    from utils.database import get_connection
+
+    conn = get_connection()
+    rows = conn.execute("""
+        SELECT q.id, q.minhash
+        FROM questions q
+        JOIN tests t ON q.test_id = t.id
+        WHERE t.user_id = ? AND t.topic_normalized = ? AND q.id > ? AND q.minhash IS NOT NULL
+    """, (user_id, topic_normalized, index.watermark)).fetchall()
+    conn.close()
+
+    for row in rows:
+        index.add(row['id'], from_blob(row['minhash']))
+        index.watermark = max(index.watermark, row['id'])
+
+def find_seen(user_id: int, topic: str, questions: List[Dict], threshold: float = None) -> List[bool]:
+    """For each question, whether the user has seen a near-duplicate of it on this topic"""
+    topic_normalized = normalize_topic(topic)
+    signatures = [signature(q['question'], topic_normalized) for q in questions]
+    index = _history_index(user_id, topic_normalized)
+    # Only lookups for the same user and topic wait on each other
+    with index.lock:
+        _refresh(index, user_id, topic_normalized)
+        return [index.match(sig, threshold) is not None for sig in signatures]
+
+def clear_cache():
+    """Drop all in-memory indexes"""
+    with _indexes_lock:
+        _indexes.clear()
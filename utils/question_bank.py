@@ -0,0 +1,251 @@
+# utils/question_bank.py - Pre-generated question bank with background refill
+#
+# Questions are stored per normalized topic and difficulty so a new test can
+# start instantly by drawing questions the user has not seen yet. A small
+# worker pool keeps popular topic/difficulty pairs above LOW_WATER_MARK;
+# Gemini is only called in the foreground when the bank cannot cover a test.
+# A pair is only refilled once it has been requested REFILL_MIN_REQUESTS
+# times in the popularity window, so a one-off topic costs no background
+# calls. Each pair keeps at most MAX_PER_PAIR questions per type, and pairs
+# nobody has asked for within the window are evicted by the periodic scan.
+
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Set, Tuple
+
+from utils import write_behind
+from utils.text import normalize_topic
+
+# Unserved-or-least-served questions per type kept for each popular pair
+LOW_WATER_MARK = int(os.environ.get("GAPMENTOR_BANK_LOW_WATER", "30"))
+
+# Questions requested from Gemini per refill call, and calls per refill
+REFILL_BATCH = 15
+MAX_REFILL_CALLS = 4
+
+# Background refill workers per process
+REFILL_WORKERS = int(os.environ.get("GAPMENTOR_BANK_WORKERS", "2"))
+
+# How often popular pairs are checked, and how many are kept warm
+REFILL_INTERVAL = 600
+POPULAR_PAIRS = 20
+POPULAR_WINDOW_DAYS = 7
+
+# Tests on a pair within the window before it is worth refilling in the background
+REFILL_MIN_REQUESTS = int(os.environ.get("GAPMENTOR_BANK_MIN_REQUESTS", "3"))
+
+# Most questions per type kept for a pair; the most served go first
+MAX_PER_PAIR = int(os.environ.get("GAPMENTOR_BANK_MAX_PER_PAIR", "200"))
+
+def question_counts(num_questions: int, include_descriptive: bool) -> Tuple[int, int]:
+    """MCQ and descriptive counts for a test (same 60/40 split as generation)"""
+    if include_descriptive:
+        mcq_count = int(num_questions * 0.6)
+        return mcq_count, num_questions - mcq_count
+    return num_questions, 0
+
+def add_questions(topic: str, difficulty: str, questions: List[Dict]):
+    """Add generated questions to the bank (duplicates are ignored)"""
+    from utils.database import question_hash
+
+    now = time.time()
+    write_behind.submit([("""
+        INSERT OR IGNORE INTO question_bank (
+            topic_normalized, difficulty, question_type, question_key, question_json, created_at
+        )
+        VALUES (?, ?, ?, ?, ?, ?)
+    """, (normalize_topic(topic), difficulty.lower().strip(), q['type'], question_hash(q['question']),
+          json.dumps(q), now)) for q in questions])
+
+def draw_questions(user_id: int, topic: str, difficulty: str, num_questions: int,
+                   include_descriptive: bool = False) -> Optional[List[Dict]]:
+    """Draw unseen questions for a new test, or None if the bank cannot cover it.
+
+    Either way a background refill is scheduled if the pair is popular.
+    """
+    from utils.database import get_connection
+    from utils.test_generator import filter_duplicate_questions
+
+    topic_key = normalize_topic(topic)
+    difficulty = difficulty.lower().strip()
+    wanted = dict(zip(("MCQ", "Descriptive"), question_counts(num_questions, include_descriptive)))
+
+    drawn, drawn_ids = [], []
+    conn = get_connection()
+    for question_type, count in wanted.items():
+        if count == 0:
+            continue
+        # Least-served first; over-fetch to leave room for questions the user has seen
+        rows = conn.execute("""
+            SELECT id, question_json
+            FROM question_bank
+            WHERE topic_normalized = ? AND difficulty = ? AND question_type = ?
+            ORDER BY served, id
+            LIMIT ?
+        """, (topic_key, difficulty, question_type, count * 4)).fetchall()
+
+        candidates = []
+        for row in rows:
+            q = json.loads(row['question_json'])
+            q['_bank_id'] = row['id']
+            candidates.append(q)
+
+        unseen = filter_duplicate_questions(user_id, topic, candidates)[:count]
+        if len(unseen) < count:
+            drawn = None
+            break
+        drawn.extend(unseen)
+    conn.close()
+
+    if is_popular(topic_key, difficulty):
+        schedule_refill(topic, difficulty)
+
+    if not drawn:
+        return None
+
+    for q in drawn:
+        drawn_ids.append(q.pop('_bank_id'))
+    write_behind.submit([("UPDATE question_bank SET served = served + 1 WHERE id = ?", (bank_id,))
+                         for bank_id in drawn_ids])
+    return drawn
+
+def _needs_refill(topic_key: str, difficulty: str) -> Dict[str, int]:
+    """How many questions of each type a pair is short of the low-water mark"""
+    from utils.database import get_connection
+
+    conn = get_connection()
+    rows = conn.execute("""
+        SELECT question_type, COUNT(*) AS count
+        FROM question_bank
+        WHERE topic_normalized = ? AND difficulty = ? AND served = 0
+        GROUP BY question_type
+    """, (topic_key, difficulty)).fetchall()
+    conn.close()
+
+    counts = {row['question_type']: row['count'] for row in rows}
+    # Descriptive questions make up 40% of mixed tests
+    targets = {"MCQ": LOW_WATER_MARK, "Descriptive": int(LOW_WATER_MARK * 0.4)}
+    return {t: target - counts.get(t, 0) for t, target in targets.items() if counts.get(t, 0) < target}
+
+def _refill(topic: str, difficulty: str):
+    """Generate questions for one pair until it is back above the low-water mark"""
+    from utils.test_generator import _generate_questions
+
+    topic_key = normalize_topic(topic)
+    try:
+        for _ in range(MAX_REFILL_CALLS):
+            shortfall = _needs_refill(topic_key, difficulty)
+            if not shortfall:
+                return
+
+            # Mixed batches cover both types in one call
+            include_descriptive = "Descriptive" in shortfall
+            success, questions = _generate_questions(topic, difficulty, REFILL_BATCH, include_descriptive)
+            if not success:
+                print(f"Question bank refill failed for {topic_key}/{difficulty}: {questions}")
+                return
+            add_questions(topic, difficulty, questions)
+            write_behind.flush()
+            _trim(topic_key, difficulty)
+    except Exception as e:
+        print(f"Question bank refill error: {e}")
+    finally:
+        with _state_lock:
+            _in_flight.discard((topic_key, difficulty))
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_pid: Optional[int] = None
+_in_flight: Set[Tuple[str, str]] = set()
+_state_lock = threading.Lock()
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor, _executor_pid
+    if _executor is None or _executor_pid != os.getpid():
+        _executor = ThreadPoolExecutor(max_workers=REFILL_WORKERS, thread_name_prefix="gapmentor-bank")
+        _executor_pid = os.getpid()
+        _in_flight.clear()
+        threading.Thread(target=_maintain_popular_pairs, name="gapmentor-bank-scan", daemon=True).start()
+    return _executor
+
+def schedule_refill(topic: str, difficulty: str):
+    """Queue a background refill for a pair unless one is already running"""
+    key = (normalize_topic(topic), difficulty.lower().strip())
+    with _state_lock:
+        executor = _get_executor()
+        if key in _in_flight:
+            return
+        _in_flight.add(key)
+    executor.submit(_refill, topic, key[1])
+
+def is_popular(topic_key: str, difficulty: str) -> bool:
+    """Whether a pair has been requested often enough recently to keep it filled"""
+    from utils.database import get_connection
+
+    conn = get_connection()
+    requests = conn.execute("""
+        SELECT COUNT(*) FROM tests
+        WHERE topic_normalized = ? AND difficulty = ? AND created_at >= datetime('now', ?)
+    """, (topic_key, difficulty, f"-{POPULAR_WINDOW_DAYS} days")).fetchone()[0]
+    conn.close()
+    return requests >= REFILL_MIN_REQUESTS
+
+def popular_pairs(limit: int = POPULAR_PAIRS) -> List[Tuple[str, str]]:
+    """Most requested topic/difficulty pairs over the recent window"""
+    from utils.database import get_connection
+
+    conn = get_connection()
+    rows = conn.execute("""
+        SELECT topic_normalized, difficulty, COUNT(*) AS requests
+        FROM tests
+        WHERE created_at >= datetime('now', ?)
+        GROUP BY topic_normalized, difficulty
+        HAVING requests >= ?
+        ORDER BY requests DESC
+        LIMIT ?
+    """, (f"-{POPULAR_WINDOW_DAYS} days", REFILL_MIN_REQUESTS, limit)).fetchall()
+    conn.close()
+    return [(row['topic_normalized'], row['difficulty']) for row in rows]
+
+def _trim(topic_key: str, difficulty: str):
+    """Keep at most MAX_PER_PAIR questions per type for a pair, dropping the most served"""
+    from utils.database import get_connection
+
+    with get_connection() as conn:
+        for question_type in ("MCQ", "Descriptive"):
+            conn.execute("""
+                DELETE FROM question_bank WHERE id IN (
+                    SELECT id FROM question_bank
+                    WHERE topic_normalized = ? AND difficulty = ? AND question_type = ?
+                    ORDER BY served, id DESC
+                    LIMIT -1 OFFSET ?
+                )
+            """, (topic_key, difficulty, question_type, MAX_PER_PAIR))
+
+def evict_cold_pairs():
+    """Drop the questions of pairs nobody has requested within the popularity window"""
+    from utils.database import get_connection
+
+    with get_connection() as conn:
+        conn.execute("""
+            DELETE FROM question_bank
+            WHERE created_at < ? AND NOT EXISTS (
+                SELECT 1 FROM tests t
+                WHERE t.topic_normalized = question_bank.topic_normalized
+                AND t.difficulty = question_bank.difficulty
+                AND t.created_at >= datetime('now', ?)
+            )
+        """, (time.time() - POPULAR_WINDOW_DAYS * 86400, f"-{POPULAR_WINDOW_DAYS} days"))
+
+def _maintain_popular_pairs():
+    """Periodically top up the most popular pairs and evict the cold ones"""
+    while True:
+        try:
+            evict_cold_pairs()
+            for topic, difficulty in popular_pairs():
+                schedule_refill(topic, difficulty)
+        except Exception as e:
+            print(f"Question bank scan error: {e}")
+        time.sleep(REFILL_INTERVAL)
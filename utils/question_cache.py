@@ -0,0 +1,135 @@
+# utils/question_cache.py - Persistent cache of generated question sets
+#
+# Generated question sets are stored in SQLite, keyed by normalized topic,
+# difficulty, question count and the descriptive flag, so identical requests
+# from different users can skip the Gemini round trip. Entries expire after
+# CACHE_TTL_SECONDS and the least recently used ones are evicted once the
+# cache grows past CACHE_MAX_BYTES. Per-user novelty is applied by the caller
+# (generate_test_questions) on top of whatever the cache returns.
+
+import json
+import os
+import time
+from typing import Dict, List, Optional
+
+from utils import write_behind
+from utils.text import normalize_topic
+
+CACHE_TTL_SECONDS = int(os.environ.get("GAPMENTOR_QUESTION_CACHE_TTL", str(7 * 24 * 3600)))
+CACHE_MAX_BYTES = int(os.environ.get("GAPMENTOR_QUESTION_CACHE_MAX_BYTES", str(50 * 1024 * 1024)))
+
+# A cached set keeps up to this many times the requested count, so users who
+# have already seen part of it can still be served unseen questions.
+SET_SIZE_FACTOR = 3
+
+def make_key(topic: str, difficulty: str, num_questions: int, include_descriptive: bool) -> str:
+    """Cache key for a question set request"""
+    return f"{normalize_topic(topic)}|{difficulty.lower().strip()}|{int(num_questions)}|{int(bool(include_descriptive))}"
+
+def lookup(topic: str, difficulty: str, num_questions: int, include_descriptive: bool) -> Optional[Dict]:
+    """Get a cached entry ({'questions', 'generation_ms'}) or None if absent or expired"""
+    from utils.database import get_connection
+
+    key = make_key(topic, difficulty, num_questions, include_descriptive)
+
+    conn = get_connection()
+    row = conn.execute("""
+        SELECT questions, generation_ms
+        FROM question_cache
+        WHERE cache_key = ? AND created_at >= ?
+    """, (key, time.time() - CACHE_TTL_SECONDS)).fetchone()
+    conn.close()
+
+    if not row:
+        return None
+
+    return {
+        'questions': json.loads(row['questions']),
+        'generation_ms': row['generation_ms'] or 0
+    }
+
+def store(topic: str, difficulty: str, num_questions: int, include_descriptive: bool,
+          questions: List[Dict], generation_ms: float, previous: List[Dict] = None):
+    """Cache a freshly generated set, keeping still-unused questions from the previous one"""
+    from utils.database import get_connection
+
+    merged, seen = [], set()
+    for q in list(questions) + list(previous or []):
+        text = q['question'].lower().strip()
+        if text not in seen:
+            seen.add(text)
+            merged.append(q)
+    merged = merged[:num_questions * SET_SIZE_FACTOR]
+
+    payload = json.dumps(merged)
+    now = time.time()
+
+    # Written synchronously so the very next request can be served from it
+    with get_connection() as conn:
+        conn.execute("""
+            INSERT OR REPLACE INTO question_cache (
+                cache_key, topic_normalized, difficulty, num_questions, include_descriptive,
+                questions, size_bytes, generation_ms, created_at, last_used_at, hits
+            )
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, 0)
+        """, (make_key(topic, difficulty, num_questions, include_descriptive), normalize_topic(topic),
+              difficulty.lower().strip(), int(num_questions), int(bool(include_descriptive)),
+              payload, len(payload.encode('utf-8')), generation_ms, now, now))
+
+        # Expired entries
+        conn.execute("DELETE FROM question_cache WHERE created_at < ?", (now - CACHE_TTL_SECONDS,))
+
+        # Least recently used entries beyond the size budget
+        conn.execute("""
+            DELETE FROM question_cache WHERE cache_key IN (
+                SELECT cache_key FROM (
+                    SELECT cache_key, SUM(size_bytes) OVER (ORDER BY last_used_at DESC, cache_key) AS running
+                    FROM question_cache
+                )
+                WHERE running > ?
+            )
+        """, (CACHE_MAX_BYTES,))
+
+def record_lookup(topic: str, difficulty: str, num_questions: int, include_descriptive: bool,
+                  outcome: str, saved_ms: float = 0):
+    """Count a lookup; outcome is 'hit', 'miss' or 'stale' (cached but too few unseen questions)"""
+    statements = [("""
+        UPDATE question_cache_stats
+        SET lookups = lookups + 1,
+            hits = hits + ?,
+            stale = stale + ?,
+            saved_ms = saved_ms + ?
+        WHERE id = 1
+    """, (int(outcome == 'hit'), int(outcome == 'stale'), saved_ms))]
+
+    if outcome == 'hit':
+        statements.append(("""
+            UPDATE question_cache
+            SET hits = hits + 1, last_used_at = ?
+            WHERE cache_key = ?
+        """, (time.time(), make_key(topic, difficulty, num_questions, include_descriptive))))
+
+    write_behind.submit(statements)
+
+def get_cache_report() -> Dict:
+    """Hit ratio, saved generation latency and size of the question cache"""
+    from utils.database import get_connection, flush_writes
+
+    flush_writes()
+    conn = get_connection()
+    stats = dict(conn.execute("SELECT lookups, hits, stale, saved_ms FROM question_cache_stats WHERE id = 1").fetchone())
+    size = conn.execute("SELECT COUNT(*) AS entries, COALESCE(SUM(size_bytes), 0) AS bytes FROM question_cache").fetchone()
+    conn.close()
+
+    stats['hit_ratio'] = round(stats['hits'] / stats['lookups'], 3) if stats['lookups'] else 0.0
+    stats['saved_seconds'] = round(stats['saved_ms'] / 1000, 1)
+    stats['entries'] = size['entries']
+    stats['size_bytes'] = size['bytes']
+    return stats
+
+def clear():
+    """Remove every cached question set"""
+    from utils.database import get_connection
+
+    with get_connection() as conn:
+        conn.execute("DELETE FROM question_cache")
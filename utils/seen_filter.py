@@ -0,0 +1,103 @@
+# utils/seen_filter.py - Per-user, per-topic Bloom filters of seen questions
+#
+# Each (user, topic) pair has a Bloom filter of the question hashes the user
+# has been given, stored as a blob in seen_question_filters and updated in the
+# same transaction that saves the questions. A novelty check loads one row and
+# tests hashes in memory; only the (few) positive hits are confirmed against
+# the questions table, since a Bloom filter can give false positives but never
+# false negatives. A filter is rebuilt at double capacity once it fills up.
+
+import math
+from typing import Dict, Iterable, List, Optional
+
+# Target false-positive rate and the capacity a new filter is sized for
+FALSE_POSITIVE_RATE = 0.01
+INITIAL_CAPACITY = 512
+
+class BloomFilter:
+    """Fixed-size Bloom filter over 64-bit hex question hashes (see database.question_hash)"""
+
+    def __init__(self, capacity: int = INITIAL_CAPACITY, bits: bytes = None, count: int = 0):
+        self.capacity = capacity
+        self.num_bits = max(64, math.ceil(-capacity * math.log(FALSE_POSITIVE_RATE) / math.log(2) ** 2))
+        self.num_hashes = max(1, round(self.num_bits / capacity * math.log(2)))
+        self.bits = bytearray(bits) if bits else bytearray((self.num_bits + 7) // 8)
+        self.count = count
+
+    def _positions(self, question_hash: str) -> Iterable[int]:
+        # Double hashing over the two 32-bit halves of the question hash
+        h1 = int(question_hash[:8], 16)
+        h2 = int(question_hash[8:16], 16) | 1
+        return ((h1 + i * h2) % self.num_bits for i in range(self.num_hashes))
+
+    def add(self, question_hash: str):
+        for pos in self._positions(question_hash):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+
+    def __contains__(self, question_hash: str) -> bool:
+        return all(self.bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(question_hash))
+
+    @property
+    def full(self) -> bool:
+        return self.count > self.capacity
+
+def load(conn, user_id: int, topic_normalized: str) -> Optional[BloomFilter]:
+    """A user's filter for a topic, or None if they have no questions on it"""
+    row = conn.execute("""
+        SELECT capacity, bits, item_count
+        FROM seen_question_filters
+        WHERE user_id = ? AND topic_normalized = ?
+    """, (user_id, topic_normalized)).fetchone()
+    if not row:
+        return None
+    return BloomFilter(row[0], row[1], row[2])
+
+def _store(conn, user_id: int, topic_normalized: str, bloom: BloomFilter):
+    conn.execute("""
+        INSERT OR REPLACE INTO seen_question_filters (user_id, topic_normalized, capacity, bits, item_count)
+        VALUES (?, ?, ?, ?, ?)
+    """, (user_id, topic_normalized, bloom.capacity, bytes(bloom.bits), bloom.count))
+
+def rebuild(conn, user_id: int, topic_normalized: str, capacity: int = None):
+    """Recreate one filter from the questions table, sized for its contents"""
+    hashes = [row[0] for row in conn.execute("""
+        SELECT q.question_hash
+        FROM questions q
+        JOIN tests t ON q.test_id = t.id
+        WHERE t.user_id = ? AND t.topic_normalized = ? AND q.question_hash IS NOT NULL
+    """, (user_id, topic_normalized)).fetchall()]
+
+    capacity = capacity or INITIAL_CAPACITY
+    while capacity < len(hashes):
+        capacity *= 2
+    bloom = BloomFilter(capacity)
+    for question_hash in hashes:
+        bloom.add(question_hash)
+    _store(conn, user_id, topic_normalized, bloom)
+
+def rebuild_all(conn, user_id: int = None):
+    """Recreate the filters of every (user, topic) pair, or of one user's topics"""
+    where, params = ("WHERE user_id = ?", (user_id,)) if user_id is not None else ("", ())
+    pairs = conn.execute(f"SELECT DISTINCT user_id, topic_normalized FROM tests {where}", params).fetchall()
+    for pair_user, topic_normalized in pairs:
+        rebuild(conn, pair_user, topic_normalized)
+
+def add_hashes(conn, user_id: int, topic_normalized: str, hashes: List[str]):
+    """Record newly saved questions; call inside the transaction that inserts them"""
+    bloom = load(conn, user_id, topic_normalized) or BloomFilter()
+    for question_hash in hashes:
+        bloom.add(question_hash)
+
+    if bloom.full:
+        # The questions are already inserted, so the rebuild includes them
+        rebuild(conn, user_id, topic_normalized, bloom.capacity * 2)
+    else:
+        _store(conn, user_id, topic_normalized, bloom)
+
+def possibly_seen(conn, user_id: int, topic_normalized: str, hashes: List[str]) -> Dict[str, bool]:
+    """In-memory pre-check: False means definitely unseen, True means confirm against the DB"""
+    bloom = load(conn, user_id, topic_normalized)
+    if bloom is None:
+        return {h: False for h in hashes}
+    return {h: h in bloom for h in hashes}
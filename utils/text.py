@@ -0,0 +1,15 @@
+# utils/text.py - Small text helpers shared across modules
+#
+# Kept free of other utils imports so the database layer, LLM telemetry and
+# the feature modules built on them can all depend on it.
+
+# Rough characters-per-token ratio used for budgeting
+CHARS_PER_TOKEN = 4
+
+def normalize_topic(topic: str) -> str:
+    """Normalize a topic (lowercase, single spaces); the one form used for every topic_normalized key"""
+    return " ".join(topic.lower().split())
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count for prompt budgeting"""
+    return len(text) // CHARS_PER_TOKEN + 1
@@ -0,0 +1,175 @@
+# utils/write_behind.py - Single-writer write-behind queue for GapMentorAI
+#
+# Fire-and-forget inserts (chat messages, notifications) are queued and
+# applied by one writer thread per process, which coalesces whatever is
+# waiting into a single transaction. Callers that must read their own
+# writes call flush(), which blocks until everything queued before it has
+# been committed.
+
+import atexit
+import os
+import queue
+import threading
+import time
+from typing import List, Optional, Tuple
+
+# Set GAPMENTOR_WRITE_BEHIND=0 to apply writes synchronously instead
+ENABLED = os.environ.get("GAPMENTOR_WRITE_BEHIND", "1") != "0"
+
+# Most write groups committed in one transaction
+MAX_BATCH = 200
+
+# How long the writer waits for more work before committing a batch (seconds)
+COALESCE_WINDOW = 0.005
+
+Statement = Tuple[str, tuple]
+
+class _Barrier:
+    """Queue marker used by flush(); set once everything before it is committed"""
+
+    def __init__(self):
+        self.done = threading.Event()
+
+class WriteBehindQueue:
+    """Queue of write groups drained by a dedicated writer thread"""
+
+    def __init__(self, max_batch: int = MAX_BATCH, coalesce_window: float = COALESCE_WINDOW):
+        self.max_batch = max_batch
+        self.coalesce_window = coalesce_window
+        self._queue = queue.Queue()
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._stopped = False
+        self.batches = 0
+        self.writes = 0
+        self.errors = 0
+        self._thread = threading.Thread(target=self._run, name="gapmentor-writer", daemon=True)
+        self._thread.start()
+
+    @property
+    def pending(self) -> int:
+        """Number of write groups queued but not yet committed"""
+        return self._pending
+
+    def submit(self, statements: List[Statement]):
+        """Queue a group of statements that must be committed together"""
+        if self._stopped:
+            _execute_now(statements)
+            return
+        with self._lock:
+            self._pending += 1
+        self._queue.put(list(statements))
+
+    def flush(self, timeout: Optional[float] = 10.0) -> bool:
+        """Block until every write queued so far is committed"""
+        if self._pending == 0 or threading.current_thread() is self._thread:
+            return True
+        barrier = _Barrier()
+        self._queue.put(barrier)
+        return barrier.done.wait(timeout)
+
+    def shutdown(self, timeout: Optional[float] = 10.0):
+        """Flush outstanding writes and stop the writer thread"""
+        if self._stopped:
+            return
+        self.flush(timeout)
+        self._stopped = True
+        self._queue.put(None)
+        self._thread.join(timeout)
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+
+            groups, barriers = [], []
+            self._collect(item, groups, barriers)
+
+            # Coalesce anything else that arrives within the window
+            deadline = time.monotonic() + self.coalesce_window
+            while len(groups) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                try:
+                    item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    self._queue.put(None)
+                    break
+                self._collect(item, groups, barriers)
+
+            if groups:
+                self._write(groups)
+            for barrier in barriers:
+                barrier.done.set()
+
+    def _collect(self, item, groups: list, barriers: list):
+        if isinstance(item, _Barrier):
+            barriers.append(item)
+        else:
+            groups.append(item)
+
+    def _write(self, groups: List[List[Statement]]):
+        from utils.database import get_connection
+
+        try:
+            with get_connection() as conn:
+                for statements in groups:
+                    for sql, params in statements:
+                        conn.execute(sql, params)
+            self.batches += 1
+            self.writes += len(groups)
+        except Exception as e:
+            # One bad group must not lose the rest: retry each on its own
+            print(f"Write-behind batch error: {e}")
+            for statements in groups:
+                try:
+                    _execute_now(statements)
+                    self.writes += 1
+                except Exception as group_error:
+                    self.errors += 1
+                    print(f"Write-behind error: {group_error}")
+        finally:
+            with self._lock:
+                self._pending -= len(groups)
+
+def _execute_now(statements: List[Statement]):
+    """Apply a group of statements synchronously in one transaction"""
+    from utils.database import get_connection
+
+    with get_connection() as conn:
+        for sql, params in statements:
+            conn.execute(sql, params)
+
+_writer: Optional[WriteBehindQueue] = None
+_writer_pid: Optional[int] = None
+_writer_lock = threading.Lock()
+
+def get_writer() -> WriteBehindQueue:
+    """Get this process's writer, starting it on first use"""
+    global _writer, _writer_pid
+    if _writer is None or _writer_pid != os.getpid():
+        with _writer_lock:
+            if _writer is None or _writer_pid != os.getpid():
+                _writer = WriteBehindQueue()
+                _writer_pid = os.getpid()
+    return _writer
+
+def submit(statements: List[Statement]):
+    """Queue statements for the writer thread (or run them now if disabled)"""
+    if not ENABLED:
+        _execute_now(statements)
+        return
+    get_writer().submit(statements)
+
+def flush(timeout: Optional[float] = 10.0) -> bool:
+    """Read-your-writes barrier: wait until queued writes are committed"""
+    if _writer is None or _writer_pid != os.getpid():
+        return True
+    return _writer.flush(timeout)
+
+@atexit.register
+def _shutdown():
+    if _writer is not None and _writer_pid == os.getpid():
+        _writer.shutdown()